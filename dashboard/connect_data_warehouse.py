@@ -1,58 +1,662 @@
 # connect_data_warehouse.py
 import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
 from pathlib import Path
 import duckdb
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+try:
+    from job_listings import JOB_LISTING_COLUMNS, job_listings_query
+except ModuleNotFoundError:
+    # dashboard2.py این ماژول را از ریشه repo به صورت dashboard.connect_data_warehouse import می‌کند
+    from .job_listings import JOB_LISTING_COLUMNS, job_listings_query
 
 # در Azure از App Settings مقدار بده: DUCKDB_PATH=/mounts/hrshare/job_ads.duckdb
 DB_PATH = os.getenv("DUCKDB_PATH", "/mnt/data/job_ads.duckdb")
+# snapshotهایی که Dagster بعد از dbt build منتشر می‌کند؛ فایل CURRENT نام snapshot فعلی را دارد.
+# خود DB_PATH (فایل کاری Dagster) هرگز باز نمی‌شود: یک اتصال read-only باز قفل فایل را نگه می‌دارد
+# و writer پایپلاین با "Conflicting lock is held" شکست می‌خورد. تا اولین snapshot داده‌ای نداریم.
+SNAPSHOT_DIR = Path(os.getenv("DUCKDB_SNAPSHOT_DIR") or Path(DB_PATH).parent / "snapshots")
+
+
+def current_db_path():
+    """مسیر snapshot فعلی (پیرو فایل CURRENT)، snapshotها immutable هستند."""
+    try:
+        name = (SNAPSHOT_DIR / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No DuckDB snapshot published in {SNAPSHOT_DIR}")
+    return SNAPSHOT_DIR / name
+
+
+# DASHBOARD_SOURCE=parquet: مارت‌ها به جای فایل DuckDB از خروجی Parquet (hive-partitioned بر اساس
+# occupation_field و workplace_region) خوانده می‌شوند که Dagster در MARTS_PARQUET_DIR منتشر می‌کند.
+SOURCE = os.getenv("DASHBOARD_SOURCE", "duckdb")
+PARQUET_DIR = Path(os.getenv("MARTS_PARQUET_DIR") or Path(DB_PATH).parent / "parquet")
+
+
+def current_parquet_dir():
+    try:
+        name = (PARQUET_DIR / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No Parquet export published in {PARQUET_DIR}")
+    return PARQUET_DIR / name
+
+
+# فایل Arrow IPC (Feather v2، بدون فشرده‌سازی) که Dagster بعد از هر snapshot منتشر می‌کند
+ARROW_DIR = Path(os.getenv("DASHBOARD_ARROW_DIR") or Path(DB_PATH).parent / "arrow")
+_arrow_lock = threading.Lock()
+_arrow_table = (None, None)
+
+
+def current_arrow_path():
+    try:
+        name = (ARROW_DIR / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No Arrow dataset published in {ARROW_DIR}")
+    return ARROW_DIR / name
+
+
+def job_listings_arrow() -> pa.Table:
+    """
+    همان داده query_job_listings (بدون source_mart، ستون‌ها UPPERCASE) به صورت pa.Table که روی فایل Arrow memory-map شده است.
+    یک نمونه برای کل پروسه؛ صفحه‌ها از OS page cache بین همه سشن‌ها و پروسه‌ها مشترک‌اند و
+    کپی pandas برای هر سشن ساخته نمی‌شود. بعد از انتشار فایل جدید، فراخوانی بعدی آن را map می‌کند.
+    اگر هنوز فایل Arrow منتشر نشده باشد (محیط local یا قبل از اولین اجرای Dagster)، همان کوئری
+    export روی منبع فعلی DuckDB/Parquet اجرا می‌شود و نتیجه برای هر نسخه داده یک بار نگه داشته می‌شود.
+    """
+    global _arrow_table
+    try:
+        key = current_arrow_path()
+    except FileNotFoundError:
+        key = data_version()
+    with _arrow_lock:
+        if _arrow_table[0] != key:
+            if isinstance(key, Path):
+                source = pa.memory_map(str(key), "r")
+                table = pa.ipc.open_file(source).read_all()
+            else:
+                table = _connect_ro().execute(job_listings_query(_table("mart_job_ads"))).fetch_arrow_table()
+            _arrow_table = (key, _normalize(table))
+        return _arrow_table[1]
+
+
+def current_source():
+    """فایل DuckDB یا پوشه Parquet فعلی، بسته به DASHBOARD_SOURCE."""
+    return current_parquet_dir() if SOURCE == "parquet" else current_db_path()
+
+
+def data_published():
+    """آیا Dagster تا حالا snapshot (یا خروجی Parquet) منتشر کرده است؛ داشبوردها قبل از آن پیام «هنوز داده‌ای نیست» نشان می‌دهند."""
+    try:
+        current_source()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _table(name):
+    """
+    FROM یک مارت. در حالت parquet فیلتر روی occupation_field/workplace_region فقط فایل‌های همان
+    پارتیشن‌ها را باز می‌کند (partition pruning) و فقط ستون‌های SELECT شده خوانده می‌شوند.
+    """
+    if SOURCE == "parquet":
+        path = (current_parquet_dir() / name / "**" / "*.parquet").as_posix()
+        return (
+            f"read_parquet('{path}', hive_partitioning = true, "
+            "hive_types = {'occupation_field': VARCHAR, 'workplace_region': VARCHAR})"
+        )
+    return f"marts.{name}"
+
+class ConnectionHolder:
+    """
+    یک اتصال read-only مشترک برای کل پروسه (همه سشن‌های Streamlit) به جای باز کردن اتصال در هر کوئری؛
+    روی Azure Files هر duckdb.connect هدر و کاتالوگ فایل را دوباره از شبکه می‌خواند.
+    هر thread یک cursor خودش را می‌گیرد. اگر فایل عوض شده باشد (inode، mtime یا size جدید)
+    یا health check ناموفق باشد، اتصال بی‌صدا دوباره باز می‌شود. اتصال قدیمی بسته نمی‌شود تا
+    کوئری‌های در حال اجرای threadهای دیگر قطع نشوند؛ با آخرین cursor خودش آزاد می‌شود.
+    """
+
+    def __init__(self, path, health_check_interval=30):
+        # path می‌تواند تابعی باشد که مسیر فعلی را برمی‌گرداند، مثل current_source
+        self.path = path
+        self.health_check_interval = health_check_interval
+        self.opens = 0
+        self.reopens = 0
+        self.failed_health_checks = 0
+        self._conn = None
+        self._signature = None
+        self._generation = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _file_signature(self):
+        path = Path(self.path() if callable(self.path) else self.path)
+        if not path.exists():
+            raise FileNotFoundError(f"DuckDB file not found: {path}")
+        stat = path.stat()
+        return str(path), stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _open(self, signature):
+        if self._conn is not None:
+            self.reopens += 1
+        if Path(signature[0]).is_dir():
+            # پوشه Parquet: یک دیتابیس in-memory که فایل‌ها را با read_parquet می‌خواند
+            self._conn = duckdb.connect()
+        else:
+            self._conn = duckdb.connect(signature[0], read_only=True)
+        self.opens += 1
+        self._signature = signature
+        self._generation += 1
+
+    def cursor(self):
+        """cursor این thread را برمی‌گرداند؛ آن را نبندید، دفعه بعد دوباره استفاده می‌شود."""
+        signature = self._file_signature()
+        with self._lock:
+            if self._conn is None or signature != self._signature:
+                self._open(signature)
+            conn, generation = self._conn, self._generation
+
+        local = self._local
+        if getattr(local, "generation", None) != generation:
+            local.cursor = conn.cursor()
+            local.generation = generation
+            local.checked_at = time.monotonic()
+        elif time.monotonic() - local.checked_at > self.health_check_interval:
+            try:
+                local.cursor.execute("SELECT 1").fetchone()
+            except duckdb.Error:
+                with self._lock:
+                    self.failed_health_checks += 1
+                    if self._generation == generation:
+                        self._open(signature)
+                return self.cursor()
+            local.checked_at = time.monotonic()
+        return local.cursor
+
+    def stats(self):
+        with self._lock:
+            return {
+                "opens": self.opens,
+                "reopens": self.reopens,
+                "failed_health_checks": self.failed_health_checks,
+            }
+
+
+connection_holder = ConnectionHolder(current_source)
+
 
 def _connect_ro():
-    p = Path(DB_PATH)
-    if not p.exists():
-        raise FileNotFoundError(f"DuckDB file not found: {p}")
-    return duckdb.connect(str(p), read_only=True)
+    return connection_holder.cursor()
+
+
+def data_version():
+    """
+    نسخه داده = (مسیر، mtime، size) snapshot فعلی. هر اجرای پایپلاین snapshot جدیدی منتشر می‌کند،
+    پس نسخه جدید یعنی داده جدید. فقط یک stat است و اتصال به DuckDB باز نمی‌کند.
+    """
+    path = current_source()
+    stat = os.stat(path)
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+def _sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """
+    کش مشترک نتایج کوئری بین همه سشن‌های Streamlit (یک نمونه در هر پروسه).
+    کلید شامل data_version() است: تا داده عوض نشده دوباره کوئری نمی‌زنیم و
+    بلافاصله بعد از هر اجرای پایپلاین کل کش خالی می‌شود. حافظه با max_bytes محدود است
+    و قدیمی‌ترین استفاده‌ها (LRU) حذف می‌شوند؛ نتیجه بزرگ‌تر از max_bytes اصلا کش نمی‌شود.
+    نتایج بین سشن‌ها مشترک‌اند، آن‌ها را in-place تغییر ندهید.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        version = data_version()
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.bytes = 0
+                self.version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = _sizeof(value)
+        with self._lock:
+            # اگر وسط کوئری داده عوض شد، نتیجه را نگه نمی‌داریم
+            if version == self.version and size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (value, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.bytes -= evicted
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "data_version": self.version,
+            }
+
+
+query_cache = QueryCache(int(os.getenv("DASHBOARD_CACHE_MB", "256")) * 1024 * 1024)
+
+
+def _cached(func):
+    """نتیجه را در query_cache نگه می‌دارد؛ لیست‌ها (مثل marts) به tuple تبدیل می‌شوند تا کلید hashable باشد."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        def freeze(v):
+            return tuple(v) if isinstance(v, list) else v
+        key = (func.__name__, tuple(freeze(a) for a in args), tuple(sorted((k, freeze(v)) for k, v in kwargs.items())))
+        return query_cache.get_or_compute(key, lambda: func(*args, **kwargs))
+    return wrapper
+
+
+# ----------------------------
+# خواندن از مسیر Arrow در DuckDB (fetch_arrow_table) به جای DBAPI/ .df()
+# ----------------------------
+# ستون‌های کم‌تنوع که در pandas به صورت categorical می‌آیند؛ بقیه رشته‌ها string[pyarrow] هستند
+CATEGORICAL_COLUMNS = {"OCCUPATION_FIELD", "WORKPLACE_REGION", "EMPLOYMENT_TYPE", "SALARY_TYPE", "DURATION", "SOURCE_MART"}
+
+
+def _normalize(table: pa.Table) -> pa.Table:
+    """تنها جای یک‌دست‌سازی نام ستون‌ها: همه خروجی‌های این ماژول UPPERCASE هستند."""
+    return table.rename_columns([c.upper() for c in table.column_names])
+
+
+def _fetch_arrow(q, params) -> pa.Table:
+    return _normalize(_connect_ro().execute(q, params).fetch_arrow_table())
+
+
+def _string_dtype(arrow_type):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
 
 
-def query_job_listings() -> pd.DataFrame:
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    for i, name in enumerate(table.column_names):
+        if name in CATEGORICAL_COLUMNS:
+            table = table.set_column(i, name, pc.dictionary_encode(table[name]))
+    # تاریخ‌ها datetime64 می‌شوند نه object، تا .dt و strftime مستقیم کار کنند
+    return table.to_pandas(types_mapper=_string_dtype, date_as_object=False)
+
+
+def _fetch(q, params) -> pd.DataFrame:
+    return _to_pandas(_fetch_arrow(q, params))
+
+
+# نگاشت مارت‌های قبلی به occupation_field در marts.mart_job_ads
+MARTS = {
+    "marts.mart_bygg_och_anlaggning": "Bygg och anläggning",
+    "marts.mart_kultur_media_design": "Kultur, media, design",
+    "marts.mart_pedagogik": "Pedagogik",
+}
+
+
+def query_job_listings(marts=None) -> pd.DataFrame:
     """
-    داده‌ها را از سه مارت زیر لود و در یک DataFrame ترکیب می‌کند:
-      1. marts.mart_bygg_och_anlaggning
-      2. marts.mart_kultur_media_design
-      3. marts.mart_pedagogik
+    داده‌ها را با یک کوئری از marts.mart_job_ads لود می‌کند.
+    فیلتر occupation_field داخل DuckDB اعمال می‌شود (predicate pushdown)
+    و ستون source_mart برای سازگاری با داشبورد از روی occupation_field ساخته می‌شود.
+    متن آگهی (job_description و job_description_html) اینجا لود نمی‌شود،
+    برای آگهی انتخاب‌شده از query_job_description بگیرید.
     """
-    marts = [
-        "marts.mart_bygg_och_anlaggning",
-        "marts.mart_kultur_media_design",
-        "marts.mart_pedagogik",
-    ]
+    marts = list(marts or MARTS)
+    fields = [MARTS[mart] for mart in marts]
 
-    base_query = """
+    source_mart = " ".join("WHEN ? THEN ?" for _ in marts)
+    placeholders = ", ".join("?" for _ in fields)
+    q = f"""
         SELECT
-            COALESCE(vacancies, 0)                      AS vacancies,
-            occupation                                  AS occupation,
-            occupation_field                            AS occupation_field,
-            CAST(application_deadline AS DATE)          AS application_deadline,
-            headline                                    AS headline,
-            job_description                              AS job_description,
-            job_description_html                         AS job_description_html,
-            employer_name                                AS employer_name,
-            employment_type                              AS employment_type,
-            salary_type                                  AS salary_type,
-            duration                                     AS duration,
-            workplace_region                             AS workplace_region,
-            job_description_id                           AS job_description_id
-        FROM {mart}
-    """
-
-    with _connect_ro() as conn:
-        all_dfs = []
-        for mart in marts:
-            q = base_query.format(mart=mart)
-            df = conn.execute(q).df()
-            df["source_mart"] = mart  # ستون برای شناسایی منبع
-            all_dfs.append(df)
-
-        combined_df = pd.concat(all_dfs, ignore_index=True)
-
-    return combined_df
+            {JOB_LISTING_COLUMNS},
+            CASE occupation_field {source_mart} END      AS source_mart
+        FROM {_table("mart_job_ads")}
+        WHERE occupation_field IN ({placeholders})
+    """
+    params = [value for mart, field in zip(marts, fields) for value in (field, mart)] + fields
+    return _fetch(q, params)
+
+
+@_cached
+def query_job_description(job_description_id):
+    """
+    متن آگهی را فقط برای یک job_description_id لود می‌کند.
+    خروجی: (job_description, job_description_html)
+    """
+    q = f"""
+        SELECT job_description, job_description_html
+        FROM {_table("mart_job_ads")}
+        WHERE job_description_id = ?
+        LIMIT 1
+    """
+    row = _connect_ro().execute(q, [job_description_id]).fetchone()
+    return row or (None, None)
+
+
+# ----------------------------
+# لایه کوئری: انتخاب‌های داشبورد -> SQL پارامتری در DuckDB
+# فقط ردیف‌ها یا aggregateهای لازم برای نمای فعلی برگردانده می‌شوند،
+# همه از طریق query_cache کش می‌شوند.
+# ----------------------------
+FILTER_COLUMNS = {
+    "region": "workplace_region",
+    "field": "occupation_field",
+    "occupation": "occupation",
+    "employer": "employer_name",
+}
+
+BREAKDOWN_COLUMNS = {
+    "employment_type": "employment_type",
+    "application_deadline": "application_deadline",
+}
+
+
+def _where(marts=None, **filters):
+    """
+    WHERE و پارامترهای آن را از مارت‌های انتخاب‌شده و فیلترهای region/field/occupation/employer می‌سازد.
+    فیلتر None نادیده گرفته می‌شود؛ لیست خالی مارت یعنی هیچ ردیفی.
+    """
+    fields = [MARTS[mart] for mart in (MARTS if marts is None else marts)]
+    if not fields:
+        return "WHERE FALSE", []
+
+    clauses = [f"occupation_field IN ({', '.join('?' for _ in fields)})"]
+    params = list(fields)
+    for name, value in filters.items():
+        if value is not None:
+            clauses.append(f"{FILTER_COLUMNS[name]} = ?")
+            params.append(value)
+    return "WHERE " + " AND ".join(clauses), params
+
+
+@_cached
+def query_options(column, marts=None, **filters) -> list:
+    """
+    مقادیر مرتب‌شده برای یک dropdown، مثلا query_options("occupation", marts, region=..., field=...).
+    از marts.mart_kpi_rollup خوانده می‌شود که خیلی کوچک‌تر از ردیف‌های آگهی است.
+    """
+    where, params = _where(marts, **filters)
+    col = FILTER_COLUMNS[column]
+    q = f"""
+        SELECT DISTINCT {col}
+        FROM {_table("mart_kpi_rollup")}
+        {where} AND {col} IS NOT NULL
+        ORDER BY {col}
+    """
+    return _fetch_arrow(q, params).column(0).to_pylist()
+
+
+@_cached
+def query_kpis(region, field) -> dict:
+    """
+    KPIهای تب Översikt برای یک region و occupation_field، از marts.mart_kpi_overview. None اگر داده‌ای نباشد.
+    UNIQUE_ADS و UNIQUE_VACANCIES بدون آگهی‌های تقریبا تکراری (dedup.ad_clusters) هستند.
+    """
+    df = _fetch(
+        f"""
+        SELECT ads, vacancies, unique_ads, unique_vacancies, employers, top_occupation, top_employer
+        FROM {_table("mart_kpi_overview")}
+        WHERE workplace_region = ? AND occupation_field = ?
+        """,
+        [region, field],
+    )
+    return None if df.empty else df.iloc[0].to_dict()
+
+
+@_cached
+def query_top_employers(region, field) -> pd.DataFrame:
+    """۱۰ کارفرما با بیشترین VACANCIES، از marts.mart_top_employers."""
+    return _fetch(
+        f"""
+        SELECT employer_name, vacancies
+        FROM {_table("mart_top_employers")}
+        WHERE workplace_region = ? AND occupation_field = ?
+        ORDER BY rank
+        """,
+        [region, field],
+    )
+
+
+@_cached
+def query_vacancies_by(column, marts=None, **filters) -> pd.DataFrame:
+    """مجموع VACANCIES به ازای employment_type یا application_deadline (روزانه)، از marts.mart_kpi_rollup."""
+    where, params = _where(marts, **filters)
+    col = BREAKDOWN_COLUMNS[column]
+    q = f"""
+        SELECT {col}, CAST(SUM(vacancies) AS BIGINT) AS vacancies
+        FROM {_table("mart_kpi_rollup")}
+        {where} AND {col} IS NOT NULL
+        GROUP BY {col}
+        ORDER BY {col}
+    """
+    return _fetch(q, params)
+
+
+@_cached
+def query_ads(marts=None, **filters) -> pd.DataFrame:
+    """ردیف‌های آگهی (بدون متن آگهی) برای فیلترهای داده‌شده، برای جدول تب Annons-sök."""
+    where, params = _where(marts, **filters)
+    q = f"""
+        SELECT
+            headline,
+            employer_name,
+            workplace_region,
+            occupation_field,
+            occupation,
+            employment_type,
+            duration,
+            salary_type,
+            CAST(application_deadline AS DATE) AS application_deadline,
+            job_description_id
+        FROM {_table("mart_job_ads")}
+        {where}
+        ORDER BY application_deadline, headline
+    """
+    return _fetch(q, params)
+
+
+# ----------------------------
+# جستجوی متنی روی headline و description_text با ایندکس search.* که Dagster بعد از dbt_models می‌سازد
+# (stem سوئدی افزونه fts، بدون stopwordها). امتیاز BM25 با k1=1.2 و b=0.75.
+# ----------------------------
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# ایندکس فقط در فایل DuckDB است؛ در حالت parquet از snapshot فعلی خوانده می‌شود
+_search_holder = connection_holder if SOURCE != "parquet" else ConnectionHolder(current_db_path)
+
+
+@_cached
+def search_ads(query, page=1, page_size=20, marts=None, **filters):
+    """
+    آگهی‌هایی که حداقل یکی از کلمات query را دارند، مرتب بر اساس امتیاز BM25، صفحه page (از ۱).
+    کلمات query با همان ماکرو search.tokenize و stem ایندکس پردازش می‌شوند، پس «lärare» با
+    «lärarna» هم پیدا می‌شود. فیلترها مثل query_ads هستند.
+    خروجی: (DataFrame همان ستون‌های query_ads به اضافه SCORE، تعداد کل نتایج)
+    """
+    where, params = _where(marts, **filters)
+    q = f"""
+        WITH
+            query_terms AS (
+                SELECT DISTINCT stem(token, 'swedish') AS term
+                FROM (SELECT unnest(search.tokenize(?)) AS token)
+            ),
+            postings AS (
+                SELECT t.job_description_id, t.tf, count(*) OVER (PARTITION BY t.term) AS df
+                FROM search.terms t
+                JOIN query_terms USING (term)
+            ),
+            corpus AS (SELECT count(*) AS n, avg(length) AS avg_length FROM search.documents),
+            scores AS (
+                SELECT
+                    p.job_description_id,
+                    sum(
+                        ln(1 + (c.n - p.df + 0.5) / (p.df + 0.5))
+                        * p.tf * ({BM25_K1} + 1)
+                        / (p.tf + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * d.length / c.avg_length))
+                    ) AS score
+                FROM postings p
+                JOIN search.documents d USING (job_description_id)
+                CROSS JOIN corpus c
+                GROUP BY p.job_description_id
+            )
+        SELECT
+            headline,
+            employer_name,
+            workplace_region,
+            occupation_field,
+            occupation,
+            employment_type,
+            duration,
+            salary_type,
+            CAST(application_deadline AS DATE) AS application_deadline,
+            job_description_id,
+            s.score,
+            count(*) OVER () AS total
+        FROM scores s
+        JOIN {_table("mart_job_ads")} USING (job_description_id)
+        {where}
+        ORDER BY s.score DESC, job_description_id
+        LIMIT ? OFFSET ?
+    """
+    cursor = _search_holder.cursor()
+    cursor.execute("LOAD fts")
+    table = _normalize(
+        cursor.execute(q, [query] + params + [page_size, (page - 1) * page_size]).fetch_arrow_table()
+    )
+    if table.num_rows:
+        total = table["TOTAL"][0].as_py()
+    else:
+        # صفحه بعد از آخرین صفحه هیچ ردیفی ندارد؛ تعداد کل از صفحه اول گرفته می‌شود
+        total = search_ads(query, 1, page_size, marts, **filters)[1] if page > 1 else 0
+    return _to_pandas(table.drop_columns(["TOTAL"])), total
+
+
+# ----------------------------
+# ایندکس سلسله‌مراتبی برای drill-down تب Annons-sök:
+# region -> field -> occupation -> employer -> annons
+# ----------------------------
+class DrillDownIndex:
+    """
+    یک بار برای هر نسخه داده روی جدول Arrow ساخته می‌شود. هر سطح dictionary-encode می‌شود و
+    کدها به رتبه برچسب در ترتیب الفبایی تبدیل می‌شوند؛ ردیف‌ها با lexsort روی همه سطوح مرتب
+    می‌شوند، پس ردیف‌های هر مسیر (مثلا region + field) یک بازه پیوسته‌اند. پیدا کردن بازه با
+    searchsorted است و گزینه‌های سطح بعد و ردیف‌های آگهی فقط از همان بازه خوانده می‌شوند،
+    یعنی هر قدم O(result) است نه اسکن کل داده.
+    """
+
+    LEVELS = ["WORKPLACE_REGION", "OCCUPATION_FIELD", "OCCUPATION", "EMPLOYER_NAME"]
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+        # take روی جدول چندتکه همه تکه‌ها را به هم می‌چسباند؛ روی هر batch جدا take می‌کنیم
+        self._batches = table.to_batches()
+        self._offsets = np.cumsum([0] + [len(batch) for batch in self._batches])
+        self.labels = []   # برچسب‌های مرتب هر سطح
+        self._rank = []    # برچسب -> رتبه
+        ranks = []
+        for level in self.LEVELS:
+            encoded = pc.dictionary_encode(table[level]).combine_chunks()
+            dictionary = encoded.dictionary.to_pylist()
+            order = sorted(range(len(dictionary)), key=dictionary.__getitem__)
+            rank_of_code = np.empty(len(dictionary) + 1, dtype=np.int32)
+            rank_of_code[order] = np.arange(len(dictionary), dtype=np.int32)
+            rank_of_code[-1] = -1  # null، اول مرتب می‌شود و در گزینه‌ها نمی‌آید
+            codes = encoded.indices.fill_null(len(dictionary)).to_numpy(zero_copy_only=False)
+            ranks.append(rank_of_code[codes])
+            self.labels.append([dictionary[i] for i in order])
+            self._rank.append({label: i for i, label in enumerate(self.labels[-1])})
+
+        # lexsort کلید آخر را کلید اصلی می‌گیرد
+        self.positions = np.lexsort(ranks[::-1])
+        self._sorted = [level_ranks[self.positions] for level_ranks in ranks]
+
+    def _range(self, path):
+        start, end = 0, len(self.positions)
+        for level, label in enumerate(path):
+            rank = self._rank[level].get(label)
+            if rank is None:
+                return 0, 0
+            rank = np.int32(rank)  # یک int پایتون کل بازه را به int64 کپی می‌کند
+            segment = self._sorted[level][start:end]
+            start, end = start + np.searchsorted(segment, rank, "left"), start + np.searchsorted(segment, rank, "right")
+        return start, end
+
+    def options(self, *path) -> list:
+        """گزینه‌های مرتب سطح بعد از path، مثلا options(region) -> occupation_fieldها."""
+        level = len(path)
+        start, end = self._range(path)
+        ranks = self._sorted[level][start:end]
+        # بازه مرتب است: از هر مقدار با searchsorted به اولین ردیف مقدار بعدی می‌پریم
+        options, pos = [], 0
+        while pos < len(ranks):
+            rank = ranks[pos]
+            if rank >= 0:
+                options.append(self.labels[level][rank])
+            pos = np.searchsorted(ranks, rank, "right")
+        return options
+
+    def ads(self, *path) -> pd.DataFrame:
+        """ردیف‌های آگهی path کامل (region, field, occupation, employer)، به ترتیب deadline و headline."""
+        start, end = self._range(path)
+        positions = np.sort(self.positions[start:end])
+        chunks = np.searchsorted(self._offsets, positions, "right") - 1
+        rows = pa.Table.from_batches(
+            [self._batches[c].take(pa.array(positions[chunks == c] - self._offsets[c])) for c in np.unique(chunks)],
+            schema=self.table.schema,
+        )
+        return _to_pandas(rows).sort_values(["APPLICATION_DEADLINE", "HEADLINE"], ignore_index=True)
+
+
+_index_lock = threading.Lock()
+_drilldown_index = (None, None)
+
+
+def drilldown_index() -> DrillDownIndex:
+    """ایندکس مشترک کل پروسه روی job_listings_arrow؛ با انتشار فایل Arrow یا نسخه داده جدید دوباره ساخته می‌شود."""
+    global _drilldown_index
+    table = job_listings_arrow()
+    with _index_lock:
+        if _drilldown_index[0] is not table:
+            _drilldown_index = (table, DrillDownIndex(table))
+        return _drilldown_index[1]
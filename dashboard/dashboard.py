@@ -1,30 +1,22 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from connect_data_warehouse import query_job_listings
+from connect_data_warehouse import (
+    MARTS,
+    data_published,
+    drilldown_index,
+    query_job_description,
+    query_kpis,
+    query_options,
+    query_top_employers,
+    query_vacancies_by,
+    search_ads,
+)
 
 # ----------------------------
-# Ladda data
+# داده‌ها دیگر یک‌جا لود نمی‌شوند: هر تب برای انتخاب فعلی
+# فقط گزینه‌های dropdown و aggregateهای لازم را از DuckDB می‌گیرد.
 # ----------------------------
-df = query_job_listings()  # یک DF ترکیبی برمی‌گرداند + ستون source_mart
-
-# استانداردسازی نام ستون‌ها به UPPERCASE تا با کد پایین match شوند
-df.columns = [c.upper() for c in df.columns]
-
-# اطمینان از وجود ستون‌های لازم (اگر اسامی کمی فرق دارند، اینجا می‌توان map کرد)
-# مثال: اگر در خروجی‌ات "JOB_DESCRIPTION_ID" نام دیگری داشت، اینجا remap کن.
-required_cols = [
-    "VACANCIES", "OCCUPATION", "OCCUPATION_FIELD", "APPLICATION_DEADLINE",
-    "HEADLINE", "JOB_DESCRIPTION", "JOB_DESCRIPTION_HTML", "EMPLOYER_NAME",
-    "EMPLOYMENT_TYPE", "SALARY_TYPE", "DURATION", "WORKPLACE_REGION",
-    "JOB_DESCRIPTION_ID", "SOURCE_MART"
-]
-for col in required_cols:
-    if col not in df.columns:
-        df[col] = pd.NA  # از کرش جلوگیری شود؛ در صورت نیاز map دقیق‌تر بده
-
-# نوع تاریخ
-df["APPLICATION_DEADLINE"] = pd.to_datetime(df["APPLICATION_DEADLINE"], errors="coerce")
 
 # ----------------------------
 # Mart filter (mapping برای نمایش قشنگ‌تر)
@@ -35,11 +27,14 @@ MART_DISPLAY_MAP = {
     "marts.mart_pedagogik": "Pedagogik",
 }
 
-# اگر source_mart در دیتا lower است، UPPER نکرده‌ایم؛ پس با مقدار اصلی مقایسه می‌کنیم
-df["SOURCE_MART"] = df["SOURCE_MART"].astype(str)
+# تا اولین snapshot داده‌ای نیست؛ فایل کاری Dagster باز نمی‌شود
+if not data_published():
+    st.info("Ingen data är publicerad ännu. Dashboarden visar data efter pipelinens första körning.")
+    st.stop()
 
-# لیست مارت‌های موجود در دیتا
-available_marts = sorted(df["SOURCE_MART"].dropna().unique())
+# لیست مارت‌هایی که در دیتا occupation_field دارند
+available_fields = set(query_options("field"))
+available_marts = sorted(m for m, field in MARTS.items() if field in available_fields)
 display_options = [MART_DISPLAY_MAP.get(m, m) for m in available_marts]
 display_to_real = {MART_DISPLAY_MAP.get(k, k): k for k in available_marts}
 
@@ -58,12 +53,9 @@ selected_display = st.multiselect(
 )
 selected_marts = [display_to_real[d] for d in selected_display] if selected_display else []
 
-# اعمال فیلتر مارت روی دیتای اصلی
-if selected_marts:
-    df = df[df["SOURCE_MART"].isin(selected_marts)]
-else:
-    # اگر کاربر همه را پاک کرد، دیتافریم خالی شود و پیام بدهیم
-    df = df.iloc[0:0]
+# اگر کاربر همه را پاک کرد، هیچ region ای نمی‌آید و پیام می‌دهیم
+regions = query_options("region", selected_marts)
+default_region = "Stockholms län" if "Stockholms län" in regions else (regions[0] if regions else None)
 
 tabs = st.tabs(["Översikt", "Annons-sök & arbetsgivare", "Trender & mönster"])
 
@@ -86,51 +78,49 @@ with tabs[0]:
     </div>
     """, unsafe_allow_html=True)
 
-    if df.empty:
+    if not regions:
         st.info("Ingen data att visa för valda datamarter.")
     else:
         filter_col, spacer, result_col = st.columns([1, 0.3, 3])
 
         with filter_col:
-            regions = sorted(df["WORKPLACE_REGION"].dropna().unique())
-            default_region = "Stockholms län" if "Stockholms län" in regions else (regions[0] if regions else None)
             selected_region = st.selectbox(
-                "📍 Välj region", regions, index=(regions.index(default_region) if default_region else 0), key="region_tab1"
-            ) if regions else None
-            df_region = df[df["WORKPLACE_REGION"] == selected_region] if selected_region else pd.DataFrame()
+                "📍 Välj region", regions, index=regions.index(default_region), key="region_tab1"
+            )
 
-            occ_fields = sorted(df_region["OCCUPATION_FIELD"].dropna().unique()) if not df_region.empty else []
+            occ_fields = query_options("field", selected_marts, region=selected_region)
             selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab1") if occ_fields else None
-            df_filtered = df_region[df_region["OCCUPATION_FIELD"] == selected_field] if selected_field else pd.DataFrame()
+            kpis = query_kpis(selected_region, selected_field) if selected_field else None
 
         with result_col:
-            if not df_filtered.empty:
+            if kpis:
                 st.subheader(f"KPIer för {selected_field} i {selected_region}")
 
                 col1, col2, col3 = st.columns(3)
-                col1.metric("📑 Antal annonser", len(df_filtered))
-                col2.metric("👥 Totalt antal tjänster", int(df_filtered["VACANCIES"].fillna(0).sum()))
-                col3.metric("🏢 Antal arbetsgivare", df_filtered["EMPLOYER_NAME"].nunique())
+                col1.metric("📑 Antal annonser", int(kpis["ADS"]))
+                col2.metric("👥 Totalt antal tjänster", int(kpis["VACANCIES"]))
+                col3.metric("🏢 Antal arbetsgivare", int(kpis["EMPLOYERS"]))
+                st.caption(
+                    f"Utan dubbletter (samma annons publicerad igen eller i flera regioner): "
+                    f"{int(kpis['UNIQUE_ADS'])} annonser, {int(kpis['UNIQUE_VACANCIES'])} tjänster"
+                )
 
-                # امن‌تر: اگر groupby خالی شد، از try/except استفاده کن
-                try:
-                    top_job = df_filtered.groupby("OCCUPATION")["VACANCIES"].sum().idxmax()
+                if pd.notna(kpis["TOP_OCCUPATION"]):
                     st.markdown("**👷 Mest annonserade yrke**")
                     st.markdown(
-                        f"<p style='font-size:25px; font-weight:normal; margin-top:-10px'>{top_job}</p>",
+                        f"<p style='font-size:25px; font-weight:normal; margin-top:-10px'>{kpis['TOP_OCCUPATION']}</p>",
                         unsafe_allow_html=True
                     )
-                except ValueError:
+                else:
                     st.write("Ingen yrkesdata.")
 
-                try:
-                    top_employer = df_filtered.groupby("EMPLOYER_NAME")["VACANCIES"].sum().idxmax()
+                if pd.notna(kpis["TOP_EMPLOYER"]):
                     st.markdown("**🏢 Topp arbetsgivare**")
                     st.markdown(
-                        f"<p style='font-size:25px; font-weight:normal; margin-top:-10px'>{top_employer}</p>",
+                        f"<p style='font-size:25px; font-weight:normal; margin-top:-10px'>{kpis['TOP_EMPLOYER']}</p>",
                         unsafe_allow_html=True
                     )
-                except ValueError:
+                else:
                     st.write("Ingen arbetsgivardata.")
             else:
                 st.info("Ingen data för vald kombination av filter.")
@@ -152,39 +142,59 @@ with tabs[1]:
     </div>
     """, unsafe_allow_html=True)
 
-    if df.empty:
+    # جستجوی متنی: به جای drill-down نتایج رتبه‌بندی‌شده (BM25) از ایندکس search نشان داده می‌شود
+    search_query = st.text_input("🔍 Sök i rubrik och annonstext", key="search_tab2").strip()
+
+    if search_query:
+        page_size = 20
+        page = int(st.number_input("Sida", min_value=1, value=1, step=1, key="search_page_tab2"))
+        df_hits, total = search_ads(search_query, page=page, page_size=page_size, marts=selected_marts)
+        st.markdown(f"### 📋 {total} träff(ar) för **{search_query}** – sida {page} av {max(1, -(-total // page_size))}")
+
+        if df_hits.empty:
+            st.info("Inga annonser matchar sökningen.")
+        else:
+            df_display = df_hits.copy()
+            df_display["APPLICATION_DEADLINE"] = df_display["APPLICATION_DEADLINE"].dt.strftime("%Y-%m-%d")
+            st.dataframe(
+                df_display[["HEADLINE", "EMPLOYER_NAME", "WORKPLACE_REGION", "OCCUPATION", "APPLICATION_DEADLINE"]],
+                use_container_width=True,
+            )
+
+            hit = st.selectbox(
+                "📄 Välj annons", range(len(df_hits)), format_func=lambda i: df_hits["HEADLINE"].iloc[i], key="hit_tab2"
+            )
+            st.markdown(f"## {df_hits['HEADLINE'].iloc[hit]}")
+            st.write(f"**Arbetsgivare:** {df_hits['EMPLOYER_NAME'].iloc[hit]} – {df_hits['WORKPLACE_REGION'].iloc[hit]}")
+            st.markdown("### 📝 Annonstext")
+            job_description, _ = query_job_description(df_hits["JOB_DESCRIPTION_ID"].iloc[hit])
+            st.write(job_description or "-")
+    elif not regions:
         st.info("Ingen data att visa för valda datamarter.")
     else:
         filter_col, spacer, result_col = st.columns([1, 0.3, 3])
 
         with filter_col:
-            regions = sorted(df["WORKPLACE_REGION"].dropna().unique())
-            default_region = "Stockholms län" if "Stockholms län" in regions else (regions[0] if regions else None)
             selected_region = st.selectbox(
-                "📍 Välj region", regions, index=(regions.index(default_region) if default_region else 0), key="region_tab2"
-            ) if regions else None
-            df_region = df[df["WORKPLACE_REGION"] == selected_region] if selected_region else pd.DataFrame()
-
-            if not df_region.empty:
-                occ_fields = sorted(df_region["OCCUPATION_FIELD"].dropna().unique())
-                selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab2") if occ_fields else None
-                df_field = df_region[df_region["OCCUPATION_FIELD"] == selected_field] if selected_field else pd.DataFrame()
-
-                if not df_field.empty:
-                    occupations = sorted(df_field["OCCUPATION"].dropna().unique())
-                    selected_occupation = st.selectbox("👷 Välj yrke", occupations, key="occ_tab2") if occupations else None
-                    df_occ = df_field[df_field["OCCUPATION"] == selected_occupation] if selected_occupation else pd.DataFrame()
-
-                    if not df_occ.empty:
-                        employers = sorted(df_occ["EMPLOYER_NAME"].dropna().unique())
-                        selected_employer = st.selectbox("🏢 Välj arbetsgivare", employers, key="employer_tab2") if employers else None
-                        df_employer = df_occ[df_occ["EMPLOYER_NAME"] == selected_employer] if selected_employer else pd.DataFrame()
-                    else:
-                        df_employer = pd.DataFrame()
-                else:
-                    df_employer = pd.DataFrame()
-            else:
-                df_employer = pd.DataFrame()
+                "📍 Välj region", regions, index=regions.index(default_region), key="region_tab2"
+            )
+            # هر قدم یک lookup در ایندکس از پیش ساخته‌شده است، نه اسکن کل داده
+            index = drilldown_index()
+            selected_fields = {MARTS[m] for m in selected_marts}
+
+            occ_fields = [f for f in index.options(selected_region) if f in selected_fields]
+            selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab2") if occ_fields else None
+
+            occupations = index.options(selected_region, selected_field) if selected_field else []
+            selected_occupation = st.selectbox("👷 Välj yrke", occupations, key="occ_tab2") if occupations else None
+
+            employers = index.options(selected_region, selected_field, selected_occupation) if selected_occupation else []
+            selected_employer = st.selectbox("🏢 Välj arbetsgivare", employers, key="employer_tab2") if employers else None
+
+            df_employer = (
+                index.ads(selected_region, selected_field, selected_occupation, selected_employer)
+                if selected_employer else pd.DataFrame()
+            )
 
         with result_col:
             if not df_employer.empty:
@@ -194,10 +204,7 @@ with tabs[1]:
                 )
 
                 df_display = df_employer.copy()
-                if pd.api.types.is_datetime64_any_dtype(df_display["APPLICATION_DEADLINE"]):
-                    df_display["APPLICATION_DEADLINE"] = df_display["APPLICATION_DEADLINE"].dt.strftime("%Y-%m-%d")
-                else:
-                    df_display["APPLICATION_DEADLINE"] = pd.to_datetime(df_display["APPLICATION_DEADLINE"], errors="coerce").dt.strftime("%Y-%m-%d")
+                df_display["APPLICATION_DEADLINE"] = pd.to_datetime(df_display["APPLICATION_DEADLINE"], errors="coerce").dt.strftime("%Y-%m-%d")
 
                 st.dataframe(
                     df_display[["HEADLINE", "EMPLOYMENT_TYPE", "DURATION", "APPLICATION_DEADLINE"]],
@@ -219,12 +226,16 @@ with tabs[1]:
                     st.write(f"**Anställningstyp:** {ad_details.get('EMPLOYMENT_TYPE', '-')}")
                     st.write(f"**Varaktighet:** {ad_details.get('DURATION', '-')}")
                     st.write(f"**Lön:** {ad_details.get('SALARY_TYPE', '-')}")
-                    deadline_val = ad_details.get('APPLICATION_DEADLINE', pd.NaT)
-                    deadline_str = deadline_val.strftime('%Y-%m-%d') if isinstance(deadline_val, pd.Timestamp) and not pd.isna(deadline_val) else '-'
+                    deadline_val = pd.to_datetime(ad_details.get('APPLICATION_DEADLINE'), errors="coerce")
+                    deadline_str = deadline_val.strftime('%Y-%m-%d') if not pd.isna(deadline_val) else '-'
                     st.write(f"**Deadline:** {deadline_str}")
 
                 st.markdown("### 📝 Annonstext")
-                st.write(ad_details.get("JOB_DESCRIPTION", "-"))
+                # متن فقط برای آگهی انتخاب‌شده و به صورت lazy لود می‌شود
+                job_description = None
+                if pd.notna(ad_details.get("JOB_DESCRIPTION_ID")):
+                    job_description, _ = query_job_description(ad_details["JOB_DESCRIPTION_ID"])
+                st.write(job_description or "-")
             else:
                 st.info("Ingen annons finns för vald kombination av filter.")
 
@@ -244,38 +255,25 @@ with tabs[2]:
     </div>
     """, unsafe_allow_html=True)
 
-    if df.empty:
+    if not regions:
         st.info("Ingen data att visa för valda datamarter.")
     else:
         filter_col, spacer, result_col = st.columns([1, 0.3, 3])
 
         with filter_col:
-            regions = sorted(df["WORKPLACE_REGION"].dropna().unique())
-            default_region = "Stockholms län" if "Stockholms län" in regions else (regions[0] if regions else None)
             selected_region = st.selectbox(
-                "📍 Välj region", regions, index=(regions.index(default_region) if default_region else 0), key="region_tab3"
-            ) if regions else None
-            df_region = df[df["WORKPLACE_REGION"] == selected_region] if selected_region else pd.DataFrame()
-
-            if not df_region.empty:
-                occ_fields = sorted(df_region["OCCUPATION_FIELD"].dropna().unique())
-                selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab3") if occ_fields else None
-                df_filtered = df_region[df_region["OCCUPATION_FIELD"] == selected_field] if selected_field else pd.DataFrame()
-            else:
-                df_filtered = pd.DataFrame()
+                "📍 Välj region", regions, index=regions.index(default_region), key="region_tab3"
+            )
+
+            occ_fields = query_options("field", selected_marts, region=selected_region)
+            selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab3") if occ_fields else None
 
         with result_col:
-            if not df_filtered.empty:
+            if selected_field:
                 st.subheader(f"Analyser för {selected_field} i {selected_region}")
 
                 # 1. Topp arbetsgivare
-                top_employers = (
-                    df_filtered.groupby("EMPLOYER_NAME")["VACANCIES"]
-                    .sum(min_count=1)
-                    .sort_values(ascending=False)
-                    .head(10)
-                    .reset_index()
-                )
+                top_employers = query_top_employers(selected_region, selected_field)
                 if not top_employers.empty:
                     fig1 = px.bar(
                         top_employers,
@@ -294,7 +292,9 @@ with tabs[2]:
                     st.info("Ingen arbetsgivardata.")
 
                 # 2. Fördelning av anställningstyper
-                type_dist = df_filtered.groupby("EMPLOYMENT_TYPE")["VACANCIES"].sum(min_count=1).reset_index()
+                type_dist = query_vacancies_by(
+                    "employment_type", selected_marts, region=selected_region, field=selected_field
+                )
                 if not type_dist.empty:
                     fig2 = px.pie(
                         type_dist,
@@ -311,18 +311,9 @@ with tabs[2]:
                     st.info("Ingen data för anställningstyp.")
 
                 # 3. Antal tjänster över deadlines
-                if pd.api.types.is_datetime64_any_dtype(df_filtered["APPLICATION_DEADLINE"]):
-                    trend_src = df_filtered
-                else:
-                    trend_src = df_filtered.copy()
-                    trend_src["APPLICATION_DEADLINE"] = pd.to_datetime(trend_src["APPLICATION_DEADLINE"], errors="coerce")
-
-                trend = (
-                    trend_src.groupby(trend_src["APPLICATION_DEADLINE"].dt.date)["VACANCIES"]
-                    .sum(min_count=1)
-                    .reset_index()
-                    .rename(columns={"APPLICATION_DEADLINE": "DATE"})
-                )
+                trend = query_vacancies_by(
+                    "application_deadline", selected_marts, region=selected_region, field=selected_field
+                ).rename(columns={"APPLICATION_DEADLINE": "DATE"})
                 if not trend.empty:
                     fig3 = px.line(
                         trend,
@@ -1,16 +1,26 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from dashboard.connect_data_warehouse2 import query_all_job_listings
+from dashboard.connect_data_warehouse import (
+    data_published,
+    drilldown_index,
+    query_job_description,
+    query_kpis,
+    query_options,
+    query_top_employers,
+    query_vacancies_by,
+)
 
 # ----------------------------
 # Ladda data
 # ----------------------------
-all_data = query_all_job_listings()
-df = pd.concat(all_data.values(), ignore_index=True)
-
-# Säkerställ datatyper
-df["APPLICATION_DEADLINE"] = pd.to_datetime(df["APPLICATION_DEADLINE"], errors="coerce")
+# Ingen data förrän pipelinen har publicerat sin första snapshot
+if not data_published():
+    st.info("Ingen data är publicerad ännu. Dashboarden visar data efter pipelinens första körning.")
+    st.stop()
+# Bara dropdown-alternativ och aggregat för aktuellt val hämtas från DuckDB
+regions = query_options("region")
+default_region = "Stockholms län" if "Stockholms län" in regions else regions[0]
 
 # ----------------------------
 # Layout
@@ -42,34 +52,35 @@ with tabs[0]:
     filter_col, spacer, result_col = st.columns([1, 0.3, 3])
 
     with filter_col:
-        regions = sorted(df["WORKPLACE_REGION"].dropna().unique())
-        default_region = "Stockholms län" if "Stockholms län" in regions else regions[0]
         selected_region = st.selectbox(
             "📍 Välj region", regions, index=regions.index(default_region), key="region_tab1"
         )
-        df_region = df[df["WORKPLACE_REGION"] == selected_region]
 
-        occ_fields = sorted(df_region["OCCUPATION_FIELD"].dropna().unique())
+        occ_fields = query_options("field", region=selected_region)
         selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab1")
-        df_filtered = df_region[df_region["OCCUPATION_FIELD"] == selected_field]
+        kpis = query_kpis(selected_region, selected_field)
 
     with result_col:
         st.subheader(f"KPIer för {selected_field} i {selected_region}")
 
-        if not df_filtered.empty:
+        if kpis:
             col1, col2, col3 = st.columns(3)
-            col1.metric("📑 Antal annonser", len(df_filtered))
-            col2.metric("👥 Totalt antal tjänster", int(df_filtered["VACANCIES"].sum()))
-            col3.metric("🏢 Antal arbetsgivare", df_filtered["EMPLOYER_NAME"].nunique())
+            col1.metric("📑 Antal annonser", int(kpis["ADS"]))
+            col2.metric("👥 Totalt antal tjänster", int(kpis["VACANCIES"]))
+            col3.metric("🏢 Antal arbetsgivare", int(kpis["EMPLOYERS"]))
+            st.caption(
+                f"Utan dubbletter (samma annons publicerad igen eller i flera regioner): "
+                f"{int(kpis['UNIQUE_ADS'])} annonser, {int(kpis['UNIQUE_VACANCIES'])} tjänster"
+            )
 
-            top_job = df_filtered.groupby("OCCUPATION")["VACANCIES"].sum().idxmax()
+            top_job = kpis["TOP_OCCUPATION"]
             st.markdown("**👷 Mest annonserade yrke**")
             st.markdown(
                 f"<p style='font-size:25px; font-weight:normal; margin-top:-10px'>{top_job}</p>",
                 unsafe_allow_html=True
             )
 
-            top_employer = df_filtered.groupby("EMPLOYER_NAME")["VACANCIES"].sum().idxmax()
+            top_employer = kpis["TOP_EMPLOYER"]
             st.markdown("**🏢 Topp arbetsgivare**")
             st.markdown(
                 f"<p style='font-size:25px; font-weight:normal; margin-top:-10px'>{top_employer}</p>",
@@ -99,37 +110,35 @@ with tabs[1]:
     filter_col, spacer, result_col = st.columns([1, 0.3, 3])
 
     with filter_col:
-        regions = sorted(df["WORKPLACE_REGION"].dropna().unique())
-        default_region = "Stockholms län" if "Stockholms län" in regions else regions[0]
         selected_region = st.selectbox(
             "📍 Välj region", regions, index=regions.index(default_region), key="region_tab2"
         )
-        df_region = df[df["WORKPLACE_REGION"] == selected_region]
 
-        if not df_region.empty:
-            occ_fields = sorted(df_region["OCCUPATION_FIELD"].dropna().unique())
-            selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab2")
-            df_field = df_region[df_region["OCCUPATION_FIELD"] == selected_field]
+        # Varje steg slår upp i ett förbyggt index i stället för att skanna alla annonser
+        index = drilldown_index()
+
+        occ_fields = index.options(selected_region)
+        selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab2")
+
+        occupations = index.options(selected_region, selected_field)
+        selected_occupation = st.selectbox("👷 Välj yrke", occupations, key="occ_tab2")
 
-            if not df_field.empty:
-                occupations = sorted(df_field["OCCUPATION"].dropna().unique())
-                selected_occupation = st.selectbox("👷 Välj yrke", occupations, key="occ_tab2")
-                df_occ = df_field[df_field["OCCUPATION"] == selected_occupation]
+        employers = index.options(selected_region, selected_field, selected_occupation)
+        selected_employer = st.selectbox("🏢 Välj arbetsgivare", employers, key="employer_tab2")
 
-                if not df_occ.empty:
-                    employers = sorted(df_occ["EMPLOYER_NAME"].dropna().unique())
-                    selected_employer = st.selectbox("🏢 Välj arbetsgivare", employers, key="employer_tab2")
-                    df_employer = df_occ[df_occ["EMPLOYER_NAME"] == selected_employer]
+        df_employer = index.ads(
+            selected_region, selected_field, selected_occupation, selected_employer
+        ) if selected_employer else pd.DataFrame()
 
     with result_col:
-        if not df_region.empty and not df_field.empty and not df_occ.empty and not df_employer.empty:
+        if not df_employer.empty:
             num_ads = len(df_employer)
             st.markdown(
                 f"### 📋 {num_ads} annons(er) för **{selected_occupation}** i **{selected_region}** – {selected_employer}"
             )
 
             df_display = df_employer.copy()
-            df_display["APPLICATION_DEADLINE"] = df_display["APPLICATION_DEADLINE"].dt.strftime("%Y-%m-%d")
+            df_display["APPLICATION_DEADLINE"] = pd.to_datetime(df_display["APPLICATION_DEADLINE"]).dt.strftime("%Y-%m-%d")
             st.dataframe(
                 df_display[["HEADLINE", "EMPLOYMENT_TYPE", "DURATION", "APPLICATION_DEADLINE"]],
                 use_container_width=True,
@@ -151,11 +160,12 @@ with tabs[1]:
                 st.write(f"**Varaktighet:** {ad_details['DURATION']}")
                 st.write(f"**Lön:** {ad_details['SALARY_TYPE']}")
                 st.write(
-                    f"**Deadline:** {ad_details['APPLICATION_DEADLINE'].strftime('%Y-%m-%d') if pd.notnull(ad_details['APPLICATION_DEADLINE']) else '-'}"
+                    f"**Deadline:** {pd.to_datetime(ad_details['APPLICATION_DEADLINE']).strftime('%Y-%m-%d') if pd.notnull(ad_details['APPLICATION_DEADLINE']) else '-'}"
                 )
 
             st.markdown("### 📝 Annonstext")
-            st.write(ad_details["JOB_DESCRIPTION"])
+            job_description, _ = query_job_description(ad_details["JOB_DESCRIPTION_ID"])
+            st.write(job_description)
         else:
             st.info("Ingen annons finns för vald kombination av filter.")
 
@@ -178,32 +188,19 @@ with tabs[2]:
     filter_col, spacer, result_col = st.columns([1, 0.3, 3])
 
     with filter_col:
-        regions = sorted(df["WORKPLACE_REGION"].dropna().unique())
-        default_region = "Stockholms län" if "Stockholms län" in regions else regions[0]
         selected_region = st.selectbox(
             "📍 Välj region", regions, index=regions.index(default_region), key="region_tab3"
         )
-        df_region = df[df["WORKPLACE_REGION"] == selected_region]
 
-        if not df_region.empty:
-            occ_fields = sorted(df_region["OCCUPATION_FIELD"].dropna().unique())
-            selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab3")
-            df_filtered = df_region[df_region["OCCUPATION_FIELD"] == selected_field]
-        else:
-            df_filtered = pd.DataFrame()
+        occ_fields = query_options("field", region=selected_region)
+        selected_field = st.selectbox("🗂️ Välj yrkesområde", occ_fields, key="field_tab3")
+        top_employers = query_top_employers(selected_region, selected_field)
 
     with result_col:
-        if not df_filtered.empty:
+        if not top_employers.empty:
             st.subheader(f"Analyser för {selected_field} i {selected_region}")
 
             # 1. Topp arbetsgivare
-            top_employers = (
-                df_filtered.groupby("EMPLOYER_NAME")["VACANCIES"]
-                .sum()
-                .sort_values(ascending=False)
-                .head(10)
-                .reset_index()
-            )
             fig1 = px.bar(
                 top_employers,
                 x="EMPLOYER_NAME",
@@ -219,7 +216,7 @@ with tabs[2]:
             st.plotly_chart(fig1, use_container_width=True)
 
             # 2. Fördelning av anställningstyper
-            type_dist = df_filtered.groupby("EMPLOYMENT_TYPE")["VACANCIES"].sum().reset_index()
+            type_dist = query_vacancies_by("employment_type", region=selected_region, field=selected_field)
             fig2 = px.pie(
                 type_dist,
                 names="EMPLOYMENT_TYPE",
@@ -233,11 +230,7 @@ with tabs[2]:
             st.plotly_chart(fig2, use_container_width=True)
 
             # 3. Antal tjänster över deadlines
-            trend = (
-                df_filtered.groupby(df_filtered["APPLICATION_DEADLINE"].dt.date)["VACANCIES"]
-                .sum()
-                .reset_index()
-            )
+            trend = query_vacancies_by("application_deadline", region=selected_region, field=selected_field)
             fig3 = px.line(
                 trend,
                 x="APPLICATION_DEADLINE",
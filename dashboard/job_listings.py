@@ -0,0 +1,22 @@
+# job_listings.py
+# تنها نسخه ستون‌های دیتاست آگهی‌های داشبورد (بدون متن آگهی). query_job_listings، فایل Arrow که
+# Dagster در orchestration/definitions.py منتشر می‌کند و جایگزین آن وقتی فایل Arrow نیست همه از
+# همین‌جا می‌خوانند. این ماژول هیچ وابستگی ندارد تا image پایپلاین هم بتواند import کند.
+JOB_LISTING_COLUMNS = """
+    COALESCE(vacancies, 0)                      AS vacancies,
+    occupation                                  AS occupation,
+    occupation_field                            AS occupation_field,
+    CAST(application_deadline AS DATE)          AS application_deadline,
+    headline                                    AS headline,
+    employer_name                               AS employer_name,
+    employment_type                             AS employment_type,
+    salary_type                                 AS salary_type,
+    duration                                    AS duration,
+    workplace_region                            AS workplace_region,
+    job_description_id                          AS job_description_id
+"""
+
+
+def job_listings_query(source="marts.mart_job_ads"):
+    """کوئری دیتاست روی source، مثلا marts.mart_job_ads یا read_parquet(...) همان مارت."""
+    return f"SELECT {JOB_LISTING_COLUMNS} FROM {source}"
@@ -0,0 +1,58 @@
+"""Tests for the dashboard's read path against throwaway DuckDB files:
+
+    cd dashboard && python -m pytest -q test_connect_data_warehouse.py
+"""
+import shutil
+import subprocess
+import sys
+
+import duckdb
+import pytest
+
+import connect_data_warehouse as dwh
+
+
+def write(path):
+    """Opens the file for writing in another process, the way dlt and dbt do in the pipeline container."""
+    script = "import duckdb, sys; duckdb.connect(sys.argv[1]).execute('create or replace table marts.written as select 1')"
+    return subprocess.run([sys.executable, "-c", script, str(path)], capture_output=True, text=True)
+
+
+@pytest.fixture
+def warehouse(tmp_path, monkeypatch):
+    working_copy = tmp_path / "job_ads.duckdb"
+    with duckdb.connect(str(working_copy)) as conn:
+        conn.execute("create schema marts")
+        conn.execute("create table marts.mart_job_ads as select 'Stockholms län' as workplace_region")
+    monkeypatch.setattr(dwh, "DB_PATH", str(working_copy))
+    monkeypatch.setattr(dwh, "SNAPSHOT_DIR", tmp_path / "snapshots")
+    monkeypatch.setattr(dwh, "SOURCE", "duckdb")
+    return working_copy
+
+
+def publish(working_copy, snapshot_dir):
+    snapshot_dir.mkdir(exist_ok=True)
+    shutil.copyfile(working_copy, snapshot_dir / "job_ads_1.duckdb")
+    (snapshot_dir / "CURRENT").write_text("job_ads_1.duckdb")
+
+
+def test_no_snapshot_never_opens_the_working_copy(warehouse):
+    holder = dwh.ConnectionHolder(dwh.current_source)
+    assert not dwh.data_published()
+    with pytest.raises(FileNotFoundError):
+        holder.cursor()
+
+    result = write(warehouse)
+    assert result.returncode == 0, result.stderr
+
+
+def test_open_holder_does_not_block_the_writer(warehouse):
+    publish(warehouse, dwh.SNAPSHOT_DIR)
+    holder = dwh.ConnectionHolder(dwh.current_source)
+    cursor = holder.cursor()
+    assert cursor.execute("select count(*) from marts.mart_job_ads").fetchone() == (1,)
+
+    # the holder keeps its connection on the snapshot for the life of the process
+    result = write(warehouse)
+    assert result.returncode == 0, result.stderr
+    assert holder.cursor() is cursor
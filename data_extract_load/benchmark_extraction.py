@@ -0,0 +1,102 @@
+"""Extraction throughput benchmark against the offline JobTech stand-in.
+
+Runs jobsearch_source through a real dlt pipeline into a temporary DuckDB and reports
+ads/sec, peak RSS and the time split across extract/normalize/load. Every run happens
+in a fresh process, so peak RSS is not shared between configurations:
+
+    python benchmark_extraction.py --ads 20000 --latency 0.1 --workers 1 4 8 --mode dicts arrow
+    python benchmark_extraction.py --ads 20000 --output baseline.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from fake_jobsearch_api import recorded_ads, start_server, synthetic_ads
+
+
+def run_once(config):
+    os.environ["JOBSEARCH_API_URL"] = config["url"]
+    os.environ.pop("JOBSEARCH_CACHE_DIR", None)  # always measure the network path
+    import dlt
+    from load_data_jobs import jobsearch_source
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = dlt.pipeline(
+            pipeline_name="jobsearch_benchmark",
+            pipelines_dir=tmp,
+            dataset_name="staging",
+            destination=dlt.destinations.duckdb(os.path.join(tmp, "benchmark.duckdb")),
+        )
+        source = jobsearch_source(arrow=config["mode"] == "arrow", max_workers=config["workers"])
+
+        timings = {}
+        start = time.perf_counter()
+        pipeline.extract(source)
+        timings["extract"] = time.perf_counter() - start
+        start = time.perf_counter()
+        pipeline.normalize()
+        timings["normalize"] = time.perf_counter() - start
+        start = time.perf_counter()
+        pipeline.load()
+        timings["load"] = time.perf_counter() - start
+
+        with pipeline.sql_client() as client:
+            ads = client.execute_sql("select count(*) from job_ads")[0][0]
+
+    total = sum(timings.values())
+    return dict(
+        config,
+        ads=ads,
+        seconds=round(total, 3),
+        ads_per_second=round(ads / total, 1),
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # KiB on Linux
+        **{f"{step}_seconds": round(seconds, 3) for step, seconds in timings.items()},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ads", type=int, default=10000, help="number of synthetic ads")
+    parser.add_argument("--recorded", help="jsonl file with recorded ads instead of synthetic ones")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--mode", choices=["dicts", "arrow"], nargs="+", default=["dicts", "arrow"])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="append the results as json lines, e.g. a regression baseline")
+    args = parser.parse_args()
+
+    ads = recorded_ads(args.recorded) if args.recorded else synthetic_ads(args.ads)
+    server = start_server(ads, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    context = multiprocessing.get_context("spawn")
+
+    results = []
+    print(f"{'mode':6} {'workers':>7} {'ads':>7} {'ads/s':>8} {'extract':>8} {'normalize':>9} {'load':>6} {'rss MB':>7} {'requests':>8}")
+    for mode in args.mode:
+        for workers in args.workers:
+            for _ in range(args.repeat):
+                requests_before = server.requests
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_once, ({"url": server.url, "mode": mode, "workers": workers},))
+                result["requests"] = server.requests - requests_before
+                results.append(result)
+                print(
+                    f"{mode:6} {workers:>7} {result['ads']:>7} {result['ads_per_second']:>8} "
+                    f"{result['extract_seconds']:>8} {result['normalize_seconds']:>9} {result['load_seconds']:>6} "
+                    f"{result['peak_rss_mb']:>7} {result['requests']:>8}"
+                )
+    server.shutdown()
+
+    if args.output:
+        with open(args.output, "a", encoding="utf8") as f:
+            for result in results:
+                f.write(json.dumps(dict(result, ads_served=len(ads), latency=args.latency)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
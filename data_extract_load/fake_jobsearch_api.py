@@ -0,0 +1,204 @@
+"""Local stand-in for the JobTech search API, used to benchmark the extraction offline.
+
+Serves /search with offset, limit, occupation-field, q, published-after,
+published-before and sort over synthetic or recorded ads, with configurable latency,
+jitter and error injection (429/503 answers and bodies cut off mid-stream):
+
+    python fake_jobsearch_api.py --ads 20000 --latency 0.15 --jitter 0.05 --error-rate 0.02 --truncate-rate 0.01
+    JOBSEARCH_API_URL=http://127.0.0.1:8765 python benchmark_extraction.py ...
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+max_offset = 2000
+max_limit = 100
+
+occupation_fields = {
+    "j7Cq_ZJe_GkT": "Bygg och anläggning",
+    "9puE_nYg_crq": "Kultur, media, design",
+    "MVqp_eS8_kDZ": "Pedagogik",
+}
+occupations = {
+    "j7Cq_ZJe_GkT": ["Snickare", "Betongarbetare", "Anläggningsarbetare", "Elektriker"],
+    "9puE_nYg_crq": ["Grafisk formgivare", "Journalist", "Fotograf", "Musiker"],
+    "MVqp_eS8_kDZ": ["Grundskollärare", "Förskollärare", "Fritidspedagog", "Speciallärare"],
+}
+regions = ["Stockholms län", "Västra Götalands län", "Skåne län", "Uppsala län", "Östergötlands län", "Norrbottens län"]
+employment_types = ["Vanlig anställning", "Behovsanställning", "Sommarjobb / feriejobb"]
+durations = ["Tills vidare", "3 - 6 månader", "Mindre än 3 månader"]
+date_format = "%Y-%m-%dT%H:%M:%S"
+
+
+def synthetic_ads(count, seed=0):
+    """Ads shaped like the search API's hits, including the nested lists dlt would normalize."""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    ads = []
+    for number in range(count):
+        field = rng.choice(list(occupation_fields))
+        occupation = rng.choice(occupations[field])
+        published = start + timedelta(minutes=rng.randrange(0, 60 * 24 * 270))
+        text = " ".join(rng.choice(["Vi", "söker", "en", "erfaren", occupation.lower(), "till", "vårt", "team."]) for _ in range(rng.randrange(150, 600)))
+        ads.append({
+            "id": str(10_000_000 + number),
+            "headline": f"{occupation} sökes",
+            "relevance": rng.random(),
+            "publication_date": published.strftime(date_format),
+            "last_publication_date": (published + timedelta(days=30)).strftime(date_format),
+            "application_deadline": (published + timedelta(days=rng.randrange(7, 60))).strftime(date_format),
+            "number_of_vacancies": rng.choice([1, 1, 1, 2, 3, None]),
+            "experience_required": rng.random() < 0.6,
+            "access_to_own_car": rng.random() < 0.2,
+            "driving_license_required": rng.random() < 0.3,
+            "description": {"text": text, "text_formatted": f"<p>{text}</p>", "company_information": None},
+            "employment_type": {"concept_id": "x", "label": rng.choice(employment_types)},
+            "salary_type": {"concept_id": "x", "label": "Fast månads- vecko- eller timlön"},
+            "duration": {"concept_id": "x", "label": rng.choice(durations)},
+            "scope_of_work": {"min": rng.choice([50, 75, 100]), "max": 100},
+            "employer": {
+                "name": f"Arbetsgivare {rng.randrange(0, count // 20 + 1)} AB",
+                "workplace": "Huvudkontoret",
+                "organization_number": f"556{rng.randrange(100000, 999999)}",
+            },
+            "workplace_address": {
+                "region": rng.choice(regions),
+                "city": "Ort",
+                "street_address": "Gatan 1",
+                "postcode": "11122",
+                "country": "Sverige",
+            },
+            "occupation": {"concept_id": "x", "label": occupation},
+            "occupation_group": {"concept_id": "x", "label": occupation},
+            "occupation_field": {"concept_id": field, "label": occupation_fields[field]},
+            "must_have": {"skills": [{"concept_id": "x", "label": "Truckkort"}], "languages": [], "work_experiences": []},
+            "nice_to_have": {"skills": [], "languages": [{"concept_id": "x", "label": "Engelska"}], "work_experiences": []},
+        })
+    return ads
+
+
+def recorded_ads(path):
+    """Ads recorded one per line, e.g. the document column of job_ads_raw."""
+    with open(path, encoding="utf8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class JobsearchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path != "/search":
+            return self._send(404, {"message": "not found"})
+
+        time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+        with server.lock:
+            server.requests += 1
+        if random.random() < server.error_rate:
+            with server.lock:
+                server.errors += 1
+            if random.random() < 0.5:
+                return self._send(429, {"message": "too many requests"}, {"Retry-After": "1"})
+            return self._send(503, {"message": "service unavailable"})
+
+        query = parse_qs(url.query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["10"])[0])
+        if offset > max_offset or not 0 <= limit <= max_limit:
+            return self._send(400, {"message": f"offset must be <= {max_offset} and limit <= {max_limit}"})
+
+        ads = server.ads
+        if "occupation-field" in query:
+            fields = set(query["occupation-field"])
+            ads = [ad for ad in ads if ad["occupation_field"]["concept_id"] in fields]
+        if query.get("q", [""])[0]:
+            words = query["q"][0].lower().split()
+            ads = [ad for ad in ads if all(word in (ad["headline"] + ad["description"]["text"]).lower() for word in words)]
+        if "published-after" in query:
+            ads = [ad for ad in ads if ad["publication_date"] >= query["published-after"][0]]
+        if "published-before" in query:
+            ads = [ad for ad in ads if ad["publication_date"] <= query["published-before"][0]]
+
+        if query.get("sort", [""])[0] == "pubdate-asc":
+            ads = ads[::-1]
+
+        payload = {"total": {"value": len(ads)}, "hits": ads[offset:offset + limit]}
+        if random.random() < server.truncate_rate:
+            with server.lock:
+                server.truncated += 1
+            return self._send(200, payload, truncate=True)
+        self._send(200, payload)
+
+    def _send(self, status, payload, headers=None, truncate=False):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf8")
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body, compresslevel=1)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if truncate:
+            # the connection drops halfway through the body the headers announced
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(ads, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, truncate_rate=0.0):
+    """Starts the stand-in in a background thread and returns the server, its url is server.url."""
+    server = ThreadingHTTPServer((host, port), JobsearchHandler)
+    server.daemon_threads = True
+    # hits are served newest first (sort=pubdate-desc), ties broken by id so the order is stable
+    server.ads = sorted(ads, key=lambda ad: (ad["publication_date"], ad["id"]), reverse=True)
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.truncate_rate = truncate_rate
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.errors = 0
+    server.truncated = 0
+    server.url = f"http://{host}:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ads", type=int, default=10000, help="number of synthetic ads")
+    parser.add_argument("--recorded", help="jsonl file with recorded ads instead of synthetic ones")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds on top of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429/503")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="share of answers cut off halfway through the body")
+    args = parser.parse_args()
+
+    ads = recorded_ads(args.recorded) if args.recorded else synthetic_ads(args.ads)
+    server = start_server(ads, args.host, args.port, args.latency, args.jitter, args.error_rate, args.truncate_rate)
+    print(f"Serving {len(ads)} ads on {server.url}/search")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
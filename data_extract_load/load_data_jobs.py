@@ -1,52 +1,342 @@
 import dlt
 import requests
+import urllib3
 import json
+import ijson
+import logging
+import os
+import pyarrow as pa
+from dlt.common.libs.pyarrow import py_arrow_to_table_schema_columns
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from response_cache import ResponseCache
 
 dlt.config["load.truncate_staging_dataset"] = True
+# arrow batches get _dlt_load_id and _dlt_id like dict rows; job_ads was created by the dict path,
+# where _dlt_id is NOT NULL, so arrow pages without it fail to load into the existing table
+dlt.config["normalize.parquet_normalizer.add_dlt_load_id"] = True
+dlt.config["normalize.parquet_normalizer.add_dlt_id"] = True
 
 query = ""
 table_name = "job_ads"
 occupation_fields = ("j7Cq_ZJe_GkT", "9puE_nYg_crq", "MVqp_eS8_kDZ")
-params = {"q": query, "limit": 100, "occupation-field": occupation_fields}
+# newest first with a fixed order, the default relevance order may change between the plan and the pages
+params = {"q": query, "limit": 100, "occupation-field": occupation_fields, "sort": "pubdate-desc"}
 
-def _get_ads(url_for_search, params):
+url = os.getenv("JOBSEARCH_API_URL", "https://jobsearch.api.jobtechdev.se")
+url_for_search = f"{url}/search"
+max_offset = 2000  # the search API refuses offsets above this
+max_workers = 4  # number of offset pages fetched at the same time
+retry_statuses = (429, 500, 502, 503, 504)
+# seconds to connect and to wait for the next bytes of a response; a stalled server raises
+# instead of hanging its worker, and the retry policy gets a chance to apply
+timeout = (10, 60)
+
+# partitions are split until each one fits under the offset cap
+date_format = "%Y-%m-%dT%H:%M:%S"
+published_floor = datetime(2015, 1, 1)  # only used to bisect the open-ended oldest window
+min_window = timedelta(minutes=1)
+
+# the columns the dbt src_* models read, flattened the way dlt normalizes the nested dicts;
+# everything else in the API document (nested lists included) is dropped before normalization
+ad_schema = pa.schema([
+    pa.field("id", pa.string(), nullable=False),
+    ("headline", pa.string()),
+    ("relevance", pa.float64()),
+    ("publication_date", pa.timestamp("us", tz="UTC")),
+    ("application_deadline", pa.timestamp("us", tz="UTC")),
+    ("number_of_vacancies", pa.int64()),
+    ("experience_required", pa.bool_()),
+    ("access_to_own_car", pa.bool_()),
+    ("driving_license_required", pa.bool_()),
+    ("description__text", pa.string()),
+    ("description__text_formatted", pa.string()),
+    ("employment_type__label", pa.string()),
+    ("salary_type__label", pa.string()),
+    ("duration__label", pa.string()),
+    ("scope_of_work__min", pa.int64()),
+    ("scope_of_work__max", pa.int64()),
+    ("employer__name", pa.string()),
+    ("employer__workplace", pa.string()),
+    ("employer__organization_number", pa.string()),
+    ("workplace_address__street_address", pa.string()),
+    ("workplace_address__region", pa.string()),
+    ("workplace_address__postcode", pa.string()),
+    ("workplace_address__city", pa.string()),
+    ("workplace_address__country", pa.string()),
+    ("occupation__label", pa.string()),
+    ("occupation_group__concept_id", pa.string()),
+    ("occupation_group__label", pa.string()),
+    ("occupation_field__concept_id", pa.string()),
+    ("occupation_field__label", pa.string()),
+])
+
+# pins the column types for both paths
+ad_table_hints = dlt.mark.make_hints(table_name="job_ads", columns=py_arrow_to_table_schema_columns(ad_schema))
+# optional cold table with the full API document as one json column, so no child tables are created
+raw_table_hints = dlt.mark.make_hints(
+    table_name="job_ads_raw",
+    write_disposition="merge",
+    primary_key="id",
+    columns={
+        "id": {"data_type": "text", "nullable": False},
+        "publication_date": {"data_type": "timestamp"},
+        "document": {"data_type": "json"},
+    },
+)
+
+# optional on-disk response cache for backfills, local development and offline benchmarks
+if os.getenv("JOBSEARCH_CACHE_DIR"):
+    response_cache = ResponseCache(
+        os.getenv("JOBSEARCH_CACHE_DIR"),
+        ttl=float(os.getenv("JOBSEARCH_CACHE_TTL", 3600)),
+        max_bytes=int(os.getenv("JOBSEARCH_CACHE_MAX_MB", 512)) * 1024 * 1024,
+    )
+else:
+    response_cache = None
+
+logger = logging.getLogger(__name__)
+
+
+def _make_session(pool_size=max_workers):
+    # one keep-alive session shared by all workers, so pages reuse the same TCP+TLS connections
+    retry = Retry(
+        total=5,
+        backoff_factor=1,
+        status_forcelist=retry_statuses,
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"accept": "application/json", "accept-encoding": "gzip"})
+    return session
+
+
+def _get_ads(url_for_search, params, session=None):
     headers = {"accept": "application/json"}
-    response = requests.get(url_for_search, headers=headers, params=params)
+    if response_cache:
+        with response_cache.open(session or requests, url_for_search, params, headers, timeout) as body:
+            return json.load(body)
+    response = (session or requests).get(url_for_search, headers=headers, params=params, timeout=timeout)
     response.raise_for_status()  # check for http errors
     return json.loads(response.content.decode("utf8"))
 
 
-@dlt.resource(table_name= "job_ads",write_disposition="append")
-def jobsearch_resource(params):
-    url = "https://jobsearch.api.jobtechdev.se"
-    url_for_search = f"{url}/search"
+def _stream_ads(url_for_search, params, session=None):
+    # hits are parsed straight off the socket, so the page body is never held in memory as bytes or str
+    headers = {"accept": "application/json"}
+    if response_cache:
+        with response_cache.open(session or requests, url_for_search, params, headers, timeout) as body:
+            yield from ijson.items(body, "hits.item", use_float=True)
+        return
+    with (session or requests).get(url_for_search, headers=headers, params=params, stream=True, timeout=timeout) as response:
+        response.raise_for_status()  # check for http errors
+        response.raw.decode_content = True
+        yield from ijson.items(response.raw, "hits.item", use_float=True)
+
+
+def _count_ads(session, params):
+    # limit=0 returns only the hit total, no ads
+    data = _get_ads(url_for_search, dict(params, limit=0, offset=0), session)
+    return data.get("total", {}).get("value", 0)
+
+
+def _split_partition(partition):
+    # split by occupation field first
+    fields = partition.get("occupation-field")
+    if isinstance(fields, (list, tuple)) and len(fields) > 1:
+        return [dict(partition, **{"occupation-field": field}) for field in fields]
+
+    # then halve the publication window, the oldest window stays open-ended
+    before = datetime.strptime(partition.get("published-before") or datetime.now().strftime(date_format), date_format)
+    if partition.get("published-after"):
+        after = datetime.strptime(partition["published-after"], date_format)
+    else:
+        after = min(published_floor, before - timedelta(days=365))
+    if before - after < min_window:
+        return []
+
+    middle = (after + (before - after) / 2).strftime(date_format)
+    return [
+        dict(partition, **{"published-before": middle}),
+        dict(partition, **{"published-after": middle, "published-before": before.strftime(date_format)}),
+    ]
+
+
+def _plan_partitions(session, pool, params):
+    """Returns (partition params, total hits) pairs that each stay under the offset cap."""
+    cap = max_offset + params.get("limit", 100)
+    planned = []
+    frontier = [dict(params)]
+
+    while frontier:
+        # count all partitions of one level in parallel
+        totals = pool.map(lambda partition: _count_ads(session, partition), frontier)
+        next_frontier = []
+        for partition, total in zip(frontier, totals):
+            if total > cap:
+                children = _split_partition(partition)
+                if children:
+                    next_frontier.extend(children)
+                    continue
+                logger.warning("Partition %s has %s hits and cannot be split, only %s are fetched", partition, total, cap)
+            if total:
+                planned.append((partition, min(total, cap)))
+        frontier = next_frontier
+
+    return planned
+
+
+def _column_value(ad, column):
+    # employer__name -> ad["employer"]["name"]
+    value = ad
+    for key in column.split("__"):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def _project_ad(ad):
+    return {column: _column_value(ad, column) for column in ad_schema.names}
+
+
+def _page_to_arrow(hits):
+    # one columnar batch per page, so dlt skips the per-row normalize step
+    columns = {}
+    for field in ad_schema:
+        values = [_column_value(ad, field.name) for ad in hits]
+        if pa.types.is_timestamp(field.type):
+            # the API sends naive timestamps, they are stored as UTC
+            columns[field.name] = pa.array(values, pa.string()).cast(pa.timestamp("us")).cast(field.type)
+        else:
+            columns[field.name] = pa.array(values, field.type)
+    return pa.Table.from_pydict(columns, schema=ad_schema)
+
+
+def _published_after(last_value):
+    # the cursor comes back from state either as a string or as a parsed timestamp
+    if not isinstance(last_value, datetime):
+        last_value = datetime.fromisoformat(last_value)
+    return last_value.strftime(date_format)
+
+
+def _fetch_page(session, page):
+    partition, offset = page
+    return list(_stream_ads(url_for_search, dict(partition, offset=offset), session))
+
+
+def has_checkpoint(pipeline):
+    """True when the last run stopped early and left pages for the next run to resume."""
+    sources = pipeline.state.get("sources", {})
+    resources = sources.get("jobsearch_source", {}).get("resources", {})
+    return "checkpoint" in resources.get("jobsearch_resource", {})
+
+
+# only ads published since the last run are requested. the cursor and the per-page checkpoint
+# live in the resource state, which dlt commits together with the loaded pages; restart=True
+# (or refresh="drop_resources") throws both away and extracts everything again.
+# the contract refuses new columns and drops values of the wrong type, so API drift
+# never triggers variant columns or table rewrites
+@dlt.resource(
+    table_name= "job_ads",
+    write_disposition="merge",
+    primary_key="id",
+    schema_contract={"columns": "freeze", "data_type": "discard_value"},
+)
+def jobsearch_resource(
+    params,
+    max_workers=max_workers,
+    arrow=False,
+    keep_raw=False,
+    restart=False,
+):
     limit = params.get("limit", 100)
-    offset = 0
+    state = dlt.current.resource_state()
+    if restart:
+        state.pop("checkpoint", None)
+        state.pop("last_published", None)
+    last_published = state.get("last_published")
+
+    with _make_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        checkpoint = state.get("checkpoint")
+        if checkpoint and "published_before" not in checkpoint:
+            # planned without an upper bound, its offsets are not stable, plan again from the cursor
+            logger.info("Discarding a checkpoint without published-before, the run is planned again")
+            checkpoint = None
+        if checkpoint:
+            # resume the interrupted run with its own plan, so only the missing pages are fetched; its
+            # partitions keep the original published-before, newer ads cannot shift the offsets
+            logger.info("Resuming extraction, %s pages already loaded", len(checkpoint["done"]))
+        else:
+            # every partition ends where planning starts, so ads published while the pages are fetched
+            # cannot push planned ads past the last planned offset, the next run starts with them.
+            # UTC is never ahead of the API's Swedish local time, the bound is never in its future
+            published_before = datetime.now(timezone.utc).strftime(date_format)
+            if response_cache:
+                # a recorded fixture replays the bound it was recorded with, so every request key repeats
+                published_before = response_cache.pin("published-before", published_before)
+            params = dict(params, **{"published-before": published_before})
+            if last_published:
+                params["published-after"] = _published_after(last_published)
+            checkpoint = state["checkpoint"] = {
+                "partitions": _plan_partitions(session, pool, params),
+                "done": [],
+                "published_before": published_before,
+            }
 
-    while True:
-        # build this page’s params
-        page_params = dict(params, offset=offset)
-        data = _get_ads(url_for_search, page_params)
+        done = set(checkpoint["done"])
+        pages = [
+            (f"{number}:{offset}", (partition, offset))
+            for number, (partition, total) in enumerate(checkpoint["partitions"])
+            for offset in range(0, total, limit)
+        ]
+        pages = [page for page in pages if page[0] not in done]
+        seen_ids = set()
 
-        hits = data.get("hits", [])
-        if not hits:
-            # no more results
-            break
+        # fetch the pages in windows of max_workers, pool.map keeps them in order
+        for start in range(0, len(pages), max_workers):
+            window = pages[start:start + max_workers]
+            results = pool.map(lambda page: _fetch_page(session, page[1]), window)
 
-        # yield each ad on this page
-        for ad in hits:
-            yield ad
+            try:
+                for (key, _), page_hits in zip(window, results):
+                    # partitions overlap on their date boundary
+                    hits = [ad for ad in page_hits if ad["id"] not in seen_ids]
+                    seen_ids.update(ad["id"] for ad in hits)
 
-        # if fewer than a full page was returned, we’re done
-        if len(hits) < limit or offset > 1900:
-            break
+                    if hits:
+                        page = _page_to_arrow(hits) if arrow else [_project_ad(ad) for ad in hits]
+                        yield dlt.mark.with_hints(page, ad_table_hints, create_table_variant=True)
 
-        offset += limit
+                        if keep_raw:
+                            raw = [{"id": ad["id"], "publication_date": ad["publication_date"], "document": ad} for ad in hits]
+                            yield dlt.mark.with_hints(raw, raw_table_hints, create_table_variant=True)
+
+                    checkpoint["done"].append(key)
+            except (requests.RequestException, urllib3.exceptions.HTTPError, ijson.JSONError):
+                # end the extract normally so the finished pages and the checkpoint are committed;
+                # a connection dropped mid-body comes out of response.raw as a urllib3 error, not a requests one
+                left = len(pages) - (len(checkpoint["done"]) - len(done))
+                logger.exception("Extraction stopped, %s of %s pages left for the next run", left, len(pages))
+                return
+
+    if response_cache:
+        logger.info("Response cache: %s", response_cache.stats())
+
+    # all pages are in, only now may the cursor move forward, to the bound every partition was fetched with
+    state["last_published"] = checkpoint["published_before"]
+    del state["checkpoint"]
 
 @dlt.source
-def jobsearch_source():
-    
-    return jobsearch_resource(params)
+def jobsearch_source(arrow=False, keep_raw=False, restart=False, max_workers=max_workers):
+    # arrow=True yields whole pages as arrow tables instead of one dict per ad,
+    # keep_raw=True also stores the full API documents in job_ads_raw,
+    # restart=True ignores the cursor and any checkpoint and extracts from scratch
+    return jobsearch_resource(params, max_workers=max_workers, arrow=arrow, keep_raw=keep_raw, restart=restart)
 
 
 #def run_pipeline(query, table_name, occupation_fields):
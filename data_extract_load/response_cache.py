@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+
+class ResponseCache:
+    """On-disk cache of search responses, keyed by url and params.
+
+    Bodies are kept gzip-compressed, entries older than ttl seconds are revalidated
+    with If-None-Match when the API sent an ETag, and the least recently used
+    entries are evicted once the cache grows past max_bytes. With ttl=inf the cache
+    never expires and works as a recorded fixture for offline runs: values the requests
+    depend on, like the run's published-before, are recorded too (see pin), so a repeat
+    run sends the same params and is answered from disk.
+    """
+
+    def __init__(self, directory, ttl=3600, max_bytes=512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+
+    def _key(self, url, params):
+        # the same query with params in a different order is the same entry
+        request = json.dumps([url, sorted((str(k), v) for k, v in params.items())], default=list)
+        return hashlib.sha256(request.encode("utf8")).hexdigest()
+
+    def pin(self, name, value):
+        """Returns the value the first run recorded for name when the cache is a fixture (ttl=inf), else value.
+
+        Only a fixture replays old answers for a new run; with a finite ttl a new run keeps its own
+        value, an answer recorded for an older published-before must not move the cursor past newer ads.
+        """
+        if self.ttl != float("inf"):
+            return value
+        path = self.directory / f"{name}.pin"
+        try:
+            return path.read_text()
+        except FileNotFoundError:
+            path.write_text(value)
+            return value
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def open(self, session, url, params, headers, timeout=None):
+        """Returns the decompressed response body as a binary file object, timeout is passed to session.get."""
+        key = self._key(url, params)
+        body_path = self.directory / f"{key}.json.gz"
+        meta_path = self.directory / f"{key}.meta.json"
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() and body_path.exists() else None
+
+        if meta and time.time() - meta["fetched_at"] < self.ttl:
+            self._count("hits")
+            body = gzip.open(body_path)
+            os.utime(body_path)  # mtime is the last use for eviction
+            return body
+
+        headers = dict(headers, **{"accept-encoding": "gzip"})
+        if meta and meta.get("etag"):
+            headers["if-none-match"] = meta["etag"]
+
+        with session.get(url, headers=headers, params=params, stream=True, timeout=timeout) as response:
+            if meta and response.status_code == 304:
+                self._count("revalidated")
+            else:
+                response.raise_for_status()  # check for http errors
+                self._count("misses")
+                meta = {"url": url, "etag": response.headers.get("etag")}
+                tmp_path = body_path.with_name(f"{key}.{threading.get_ident()}.tmp")
+                with open(tmp_path, "wb") as out:
+                    if response.headers.get("content-encoding") == "gzip":
+                        # stored exactly as sent, no recompression
+                        shutil.copyfileobj(response.raw, out)
+                    else:
+                        response.raw.decode_content = True
+                        with gzip.GzipFile(fileobj=out, mode="wb") as compressed:
+                            shutil.copyfileobj(response.raw, compressed)
+                os.replace(tmp_path, body_path)
+
+        meta["fetched_at"] = time.time()
+        meta_path.write_text(json.dumps(meta))
+        # opened before evicting, so a concurrent eviction cannot remove it first
+        body = gzip.open(body_path)
+        self._evict()
+        return body
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self.directory.glob("*.json.gz"), key=lambda path: path.stat().st_mtime)
+            size = sum(path.stat().st_size for path in entries)
+            # the newest entry is never evicted, it is about to be read
+            for path in entries[:-1]:
+                if size <= self.max_bytes:
+                    break
+                size -= path.stat().st_size
+                path.unlink(missing_ok=True)
+                path.with_name(path.name.replace(".json.gz", ".meta.json")).unlink(missing_ok=True)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated}
@@ -0,0 +1,152 @@
+"""Regression tests for the extraction against the offline JobTech stand-in:
+
+    cd data_extract_load && python -m pytest -q test_load_data_jobs.py
+"""
+import time
+from datetime import datetime, timezone
+
+import dlt
+import pytest
+
+from fake_jobsearch_api import date_format, start_server, synthetic_ads
+
+# enough ads that every occupation field needs offsets past 1000
+ad_count = 4000
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = start_server(synthetic_ads(ad_count))
+    import load_data_jobs
+
+    monkeypatch.setattr(load_data_jobs, "url_for_search", f"{server.url}/search")
+    monkeypatch.setattr(load_data_jobs, "response_cache", None)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    return dlt.pipeline(
+        pipeline_name="jobsearch_test",
+        pipelines_dir=str(tmp_path),
+        dataset_name="staging",
+        destination=dlt.destinations.duckdb(str(tmp_path / "test.duckdb")),
+    )
+
+
+def publish(server, count, first_number):
+    """Adds ads published right now, the newest hits of the next request."""
+    time.sleep(1)  # strictly after the plan's published-before, which has second resolution
+    published = datetime.now(timezone.utc).replace(tzinfo=None).strftime(date_format)
+    ads = synthetic_ads(count, seed=first_number)
+    for number, ad in enumerate(ads):
+        ad["id"] = str(first_number + number)
+        ad["publication_date"] = published
+    with server.lock:
+        server.ads = sorted(server.ads + ads, key=lambda ad: (ad["publication_date"], ad["id"]), reverse=True)
+    return {ad["id"] for ad in ads}
+
+
+def loaded_ids(pipeline):
+    with pipeline.sql_client() as client:
+        return {row[0] for row in client.execute_sql("select id from job_ads")}
+
+
+def test_ads_published_during_a_run_are_not_lost(server, pipeline, monkeypatch):
+    import load_data_jobs
+
+    original = {ad["id"] for ad in server.ads}
+    plan = load_data_jobs._plan_partitions
+    new_ids = set()
+
+    def plan_then_publish(*args):
+        planned = plan(*args)
+        new_ids.update(publish(server, 300, 20_000_000))
+        return planned
+
+    monkeypatch.setattr(load_data_jobs, "_plan_partitions", plan_then_publish)
+    pipeline.run(load_data_jobs.jobsearch_source())
+    assert original <= loaded_ids(pipeline)
+
+    monkeypatch.setattr(load_data_jobs, "_plan_partitions", plan)
+    pipeline.run(load_data_jobs.jobsearch_source())
+    assert original | new_ids == loaded_ids(pipeline)
+
+
+def test_resume_after_newer_ads_loses_nothing(server, pipeline, monkeypatch):
+    import load_data_jobs
+    import requests
+
+    original = {ad["id"] for ad in server.ads}
+    fetch = load_data_jobs._fetch_page
+
+    def fail_at_offset_1000(session, page):
+        if page[1] == 1000:
+            raise requests.ConnectionError("connection reset")
+        return fetch(session, page)
+
+    monkeypatch.setattr(load_data_jobs, "_fetch_page", fail_at_offset_1000)
+    pipeline.run(load_data_jobs.jobsearch_source())
+    assert load_data_jobs.has_checkpoint(pipeline)
+    assert original > loaded_ids(pipeline)
+
+    new_ids = publish(server, 300, 20_000_000)
+    monkeypatch.setattr(load_data_jobs, "_fetch_page", fetch)
+    pipeline.run(load_data_jobs.jobsearch_source())
+    assert not load_data_jobs.has_checkpoint(pipeline)
+    assert original == loaded_ids(pipeline)
+
+    pipeline.run(load_data_jobs.jobsearch_source())
+    assert original | new_ids == loaded_ids(pipeline)
+
+
+def test_body_cut_off_mid_stream_is_resumed(server, pipeline, monkeypatch):
+    import load_data_jobs
+
+    original = {ad["id"] for ad in server.ads}
+    plan = load_data_jobs._plan_partitions
+
+    def plan_then_truncate(*args):
+        planned = plan(*args)
+        server.truncate_rate = 1.0
+        return planned
+
+    monkeypatch.setattr(load_data_jobs, "_plan_partitions", plan_then_truncate)
+    pipeline.run(load_data_jobs.jobsearch_source())
+    assert server.truncated
+    assert load_data_jobs.has_checkpoint(pipeline)
+
+    server.truncate_rate = 0.0
+    monkeypatch.setattr(load_data_jobs, "_plan_partitions", plan)
+    pipeline.run(load_data_jobs.jobsearch_source())
+    assert not load_data_jobs.has_checkpoint(pipeline)
+    assert original == loaded_ids(pipeline)
+
+
+def test_arrow_pages_load_into_a_table_created_by_dict_rows(server, pipeline):
+    import load_data_jobs
+
+    original = {ad["id"] for ad in server.ads}
+    pipeline.run(load_data_jobs.jobsearch_source())
+    pipeline.run(load_data_jobs.jobsearch_source(arrow=True, restart=True))
+    assert original == loaded_ids(pipeline)
+    with pipeline.sql_client() as client:
+        assert client.execute_sql("select count(*) from job_ads where _dlt_id is null")[0][0] == 0
+
+
+def test_repeat_run_is_answered_by_a_fixture_cache(server, pipeline, monkeypatch, tmp_path):
+    import load_data_jobs
+    from response_cache import ResponseCache
+
+    cache = ResponseCache(tmp_path / "http_cache", ttl=float("inf"))
+    monkeypatch.setattr(load_data_jobs, "response_cache", cache)
+    pipeline.run(load_data_jobs.jobsearch_source())
+    first = loaded_ids(pipeline)
+    requests_sent = server.requests
+
+    time.sleep(1)  # a new run starts at a later published-before
+    pipeline.run(load_data_jobs.jobsearch_source(restart=True))
+    assert server.requests == requests_sent
+    assert cache.hits == cache.misses > 0
+    assert first == loaded_ids(pipeline) == {ad["id"] for ad in server.ads}
@@ -0,0 +1,4 @@
+{% macro generate_integer_key(field_list) %}
+    -- 64-bit integer key from DuckDB's native hash, cheaper to join and store than md5 strings
+    hash({{ field_list | join(', ') }})
+{% endmacro %}
@@ -2,7 +2,7 @@ with src_employer as (select * from {{ ref('src_employer') }})
 
 
 select
-    {{ dbt_utils.generate_surrogate_key(['employer_name'])}} as employer_id,
+    {{ generate_integer_key(['employer_name'])}} as employer_id,
     employer_name,
     max(employer_workplace) as employer_workplace,
     max(employer_organization_number) as employer_organization_number,
@@ -14,4 +14,4 @@ select
 from src_employer
 group by employer_name
 
-### --This model creates a dimension table for employers related to job postings.
\ No newline at end of file
+--This model creates a dimension table for employers related to job postings.
\ No newline at end of file
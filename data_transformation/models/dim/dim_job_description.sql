@@ -1,8 +1,23 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='merge',
+        unique_key='job_description_id',
+        on_schema_change='append_new_columns'
+    )
+}}
+
 with src_job_description as (select * from {{ ref('src_job_description') }})
 
 select
     id as job_description_id,
     headline,
     description_text,
-    description_html
-from src_job_description
\ No newline at end of file
+    description_html,
+    _dlt_load_id
+from src_job_description
+
+-- only the dlt loads that arrived since the last run, merged on the ad id
+{% if is_incremental() %}
+where _dlt_load_id > (select coalesce(max(_dlt_load_id), '') from {{ this }})
+{% endif %}
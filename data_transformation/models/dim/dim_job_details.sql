@@ -1,7 +1,7 @@
 with src_job_details as (select * from {{ ref('src_job_details') }})
 
 select
-    {{ dbt_utils.generate_surrogate_key(['employment_type', 'salary_type', 'duration', 'scope_of_work_min', 'scope_of_work_max'])}} as job_details_id,
+    {{ generate_integer_key(['employment_type', 'salary_type', 'duration', 'scope_of_work_min', 'scope_of_work_max'])}} as job_details_id,
     max(employment_type) as employment_type,
     max(salary_type) as salary_type,
     max(duration) as duration,
@@ -10,4 +10,4 @@ select
 from src_job_details
 group by job_details_id
 
-### --This SQL file is for creating the dim_job_details dimension table.
+--This SQL file is for creating the dim_job_details dimension table.
@@ -1,13 +1,27 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='merge',
+        unique_key='job_description_id',
+        on_schema_change='append_new_columns'
+    )
+}}
 
 with HR_JOBS as (select * from {{ ref('src_job_ads') }})
 
 select
     id as job_description_id,
-    {{ dbt_utils.generate_surrogate_key(['experience_required', 'access_to_own_car', 'driving_license_required'])}} as auxilliary_id,
-    {{ dbt_utils.generate_surrogate_key(['employer_name'])}} as employer_id,
-    {{ dbt_utils.generate_surrogate_key(['employment_type', 'salary_type', 'duration', 'scope_of_work_min', 'scope_of_work_max'])}} as job_details_id,
-    {{ dbt_utils.generate_surrogate_key(['occupation']) }} as occupation_id,
+    {{ generate_integer_key(['experience_required', 'access_to_own_car', 'driving_license_required'])}} as auxilliary_id,
+    {{ generate_integer_key(['employer_name'])}} as employer_id,
+    {{ generate_integer_key(['employment_type', 'salary_type', 'duration', 'scope_of_work_min', 'scope_of_work_max'])}} as job_details_id,
+    {{ generate_integer_key(['occupation']) }} as occupation_id,
     vacancies,
     relevance,
-    application_deadline
-from HR_JOBS
\ No newline at end of file
+    application_deadline,
+    _dlt_load_id
+from HR_JOBS
+
+-- only the dlt loads that arrived since the last run, merged on the ad id
+{% if is_incremental() %}
+where _dlt_load_id > (select coalesce(max(_dlt_load_id), '') from {{ this }})
+{% endif %}
@@ -0,0 +1,37 @@
+
+with
+    mart_kpi_rollup as (select * from {{ ref('mart_kpi_rollup') }}),
+    occupations as (
+        select workplace_region, occupation_field, occupation, sum(vacancies) as vacancies
+        from mart_kpi_rollup
+        group by all
+    ),
+    employers as (
+        select workplace_region, occupation_field, employer_name, sum(vacancies) as vacancies
+        from mart_kpi_rollup
+        group by all
+    ),
+    totals as (
+        select
+            workplace_region,
+            occupation_field,
+            cast(sum(ads) as bigint) as ads,
+            cast(sum(vacancies) as bigint) as vacancies,
+            cast(sum(unique_ads) as bigint) as unique_ads,
+            cast(sum(unique_vacancies) as bigint) as unique_vacancies,
+            count(distinct employer_name) as employers
+        from mart_kpi_rollup
+        group by all
+    )
+
+-- one row of KPIs per region and occupation field, ties go to the first name alphabetically
+select
+    t.*,
+    (select occupation from occupations o
+        where o.workplace_region = t.workplace_region and o.occupation_field = t.occupation_field
+        order by o.vacancies desc, o.occupation limit 1) as top_occupation,
+    (select employer_name from employers e
+        where e.workplace_region = t.workplace_region and e.occupation_field = t.occupation_field
+        order by e.vacancies desc, e.employer_name limit 1) as top_employer
+from totals t
+order by occupation_field, workplace_region
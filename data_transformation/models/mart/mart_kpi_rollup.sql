@@ -0,0 +1,19 @@
+
+with mart_job_ads as (select * from {{ ref('mart_job_ads') }})
+
+-- ads and vacancies pre-aggregated for the dashboard's overview and trend tabs
+select
+    workplace_region,
+    occupation_field,
+    occupation,
+    employer_name,
+    employment_type,
+    cast(application_deadline as date) as application_deadline,
+    count(*) as ads,
+    cast(sum(coalesce(vacancies, 0)) as bigint) as vacancies,
+    -- reposts and copies in other regions counted once, in the region of the cluster's own ad
+    count(*) filter (where not is_duplicate) as unique_ads,
+    cast(coalesce(sum(coalesce(vacancies, 0)) filter (where not is_duplicate), 0) as bigint) as unique_vacancies
+from mart_job_ads
+group by all
+order by occupation_field, workplace_region
@@ -0,0 +1,14 @@
+
+with mart_kpi_rollup as (select * from {{ ref('mart_kpi_rollup') }})
+
+-- the ten employers with most vacancies per region and occupation field
+select
+    workplace_region,
+    occupation_field,
+    employer_name,
+    cast(sum(vacancies) as bigint) as vacancies,
+    row_number() over (partition by workplace_region, occupation_field order by sum(vacancies) desc, employer_name) as rank
+from mart_kpi_rollup
+group by workplace_region, occupation_field, employer_name
+qualify rank <= 10
+order by occupation_field, workplace_region, rank
@@ -1,6 +1,6 @@
 -- this is an extract of the model
 
-with STG_HR_JOBS as (select * from {{ source('HR_JOBS', 'stg_ads') }})
+with STG_HR_JOBS as (select * from {{ ref('stg_job_ads') }})
 
 select
     id,
@@ -16,5 +16,6 @@ select
     occupation__label as occupation,
     COALESCE(number_of_vacancies, 1) as vacancies,
     relevance,
-    application_deadline
+    application_deadline,
+    _dlt_load_id
 from STG_HR_JOBS
\ No newline at end of file
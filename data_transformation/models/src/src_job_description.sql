@@ -1,8 +1,9 @@
-with STG_HR_JOBS as (select * from {{ source('HR_JOBS', 'stg_ads') }})
+with STG_HR_JOBS as (select * from {{ ref('stg_job_ads') }})
 
 select
     id,
     headline,
     COALESCE(description__text, 'Beskrivning saknas') as description_text,
-    COALESCE(description__text_formatted, 'Beskrivning saknas') as description_html
+    COALESCE(description__text_formatted, 'Beskrivning saknas') as description_html,
+    _dlt_load_id
 from STG_HR_JOBS
@@ -1,4 +1,4 @@
-with STG_HR_JOBS as (select * from {{ source('HR_JOBS', 'stg_ads') }})
+with STG_HR_JOBS as (select * from {{ ref('stg_job_ads') }})
 
 select
     COALESCE(employment_type__label, 'Ospecifierad') as employment_type,
@@ -0,0 +1,20 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='merge',
+        unique_key='id',
+        on_schema_change='append_new_columns'
+    )
+}}
+
+-- latest version of every ad, all src_* models read from here instead of the raw dlt table
+with STG_HR_JOBS as (
+    select * from {{ source('HR_JOBS', 'stg_ads') }}
+    {% if is_incremental() %}
+    where _dlt_load_id > (select coalesce(max(_dlt_load_id), '') from {{ this }})
+    {% endif %}
+)
+
+select *
+from STG_HR_JOBS
+qualify row_number() over (partition by id order by _dlt_load_id desc) = 1
@@ -0,0 +1,11 @@
+{% test integer_key_collisions(model, fields) %}
+
+-- fails for every integer key that more than one combination of values hashes to
+select
+    {{ generate_integer_key(fields) }} as integer_key,
+    count(distinct ({{ fields | join(', ') }})) as value_combinations
+from {{ model }}
+group by integer_key
+having count(distinct ({{ fields | join(', ') }})) > 1
+
+{% endtest %}
@@ -1,5 +1,9 @@
 from pathlib import Path
+from datetime import datetime, timezone
+import shutil
 import dlt
+import duckdb
+import pyarrow as pa
 import dagster as dg
 from dagster_dbt import DbtCliResource, DbtProject, dbt_assets
 from dagster import Definitions
@@ -8,26 +12,52 @@ import sys
 import os
 
 
+# warehouse maintenance next to this file, the assets below only wrap it
+from full_text_search import update_search_index
+from near_duplicates import update_ad_clusters
+
 sys.path.insert(0, "../data_extract_load")
-from load_data_jobs import jobsearch_source
+from load_data_jobs import jobsearch_source, has_checkpoint
+# the dashboard owns the columns of its dataset, the Arrow export writes exactly those
+sys.path.insert(0, "../dashboard")
+from job_listings import job_listings_query
 
+# DUCKDB_PATH is the working copy dlt and dbt write to, the dashboard reads published snapshots
 DUCKDB_PATH = os.getenv("DUCKDB_PATH")
 DBT_PROFILES_DIR = os.getenv("DBT_PROFILES_DIR")
+SNAPSHOT_DIR = Path(os.getenv("DUCKDB_SNAPSHOT_DIR") or Path(DUCKDB_PATH).parent / "snapshots")
+SNAPSHOT_KEEP = int(os.getenv("DUCKDB_SNAPSHOT_KEEP", "3"))
+MARTS_PARQUET_DIR = Path(os.getenv("MARTS_PARQUET_DIR") or Path(DUCKDB_PATH).parent / "parquet")
+PARQUET_MARTS = ["mart_job_ads", "mart_kpi_rollup", "mart_kpi_overview", "mart_top_employers"]
+DASHBOARD_ARROW_DIR = Path(os.getenv("DASHBOARD_ARROW_DIR") or Path(DUCKDB_PATH).parent / "arrow")
 
 #dlt assets
 dlt_resource = DagsterDltResource()
 
+jobsearch_pipeline = dlt.pipeline(
+    pipeline_name="HRpipeline",
+    dataset_name="staging",
+    destination=dlt.destinations.duckdb(DUCKDB_PATH),
+)
+
+class JobsearchConfig(dg.Config):
+    # set in the launchpad's run config to drop the cursor and any checkpoint and extract everything again
+    restart: bool = False
+
+
 @dlt_assets(
     dlt_source = jobsearch_source(),
-    dlt_pipeline= dlt.pipeline(
-        pipeline_name="HRpipeline",
-        dataset_name="staging",
-        destination=dlt.destinations.duckdb(DUCKDB_PATH),
-    
-    ),
+    dlt_pipeline= jobsearch_pipeline,
 )
-def dlt_load(context:dg.AssetExecutionContext, dlt:DagsterDltResource):
-    yield from dlt.run(context=context)
+def dlt_load(context:dg.AssetExecutionContext, dlt:DagsterDltResource, config:JobsearchConfig):
+    # retries keep the run config, only the first attempt restarts so the later ones resume its checkpoint
+    restart = config.restart and context.retry_number == 0
+    # collected first: a materialization yielded before the Failure would start job_dbt on a partial load
+    events = list(dlt.run(context=context, dlt_source=jobsearch_source(restart=restart)))
+    # the extraction stops early on API errors and commits a checkpoint, fail so the retry resumes from it
+    if has_checkpoint(jobsearch_pipeline):
+        raise dg.Failure("Job ads extraction was interrupted, the retry resumes from the last loaded page")
+    yield from events
     
 
 
@@ -49,10 +79,154 @@ def dbt_models(context: dg.AssetExecutionContext, dbt: DbtCliResource):
     yield from dbt.cli(["build"],context=context).stream()
     
 
+#snapshot publishing
+def _version_name(prefix, suffix=""):
+    return f"{prefix}_{datetime.now(timezone.utc):%Y%m%dT%H%M%S}{suffix}"
+
+
+def _point_current(directory, name):
+    # readers only ever see a complete version, the switch is one rename of the pointer file
+    pointer_tmp = directory / ".CURRENT.tmp"
+    pointer_tmp.write_text(name)
+    os.replace(pointer_tmp, directory / "CURRENT")
+
+
+def _prune(directory, pattern, keep):
+    for old in sorted(directory.glob(pattern))[:-max(keep, 1)]:
+        try:
+            shutil.rmtree(old) if old.is_dir() else old.unlink()
+        except OSError:
+            pass  # still open by a reader on the share, removed by a later publish
+
+
+def current_snapshot():
+    return SNAPSHOT_DIR / (SNAPSHOT_DIR / "CURRENT").read_text().strip()
+
+
+def publish_snapshot(working_copy, snapshot_dir, keep):
+    """Copies the working copy to a new immutable snapshot and points CURRENT at it, keeping the newest `keep`."""
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    # fold the WAL into the database file so the copy is complete
+    with duckdb.connect(str(working_copy)) as conn:
+        conn.execute("CHECKPOINT")
+
+    name = _version_name("job_ads", ".duckdb")
+    tmp = snapshot_dir / f".{name}.tmp"
+    shutil.copyfile(working_copy, tmp)
+    os.replace(tmp, snapshot_dir / name)
+
+    _point_current(snapshot_dir, name)
+    _prune(snapshot_dir, "job_ads_*.duckdb", keep)
+    return snapshot_dir / name
+
+
+def export_marts_parquet(snapshot, parquet_dir, keep):
+    """
+    Writes the marts as hive-partitioned Parquet (occupation_field, workplace_region) into a new
+    versioned directory and points CURRENT at it, so a reader filtering on both only opens one file.
+    """
+    parquet_dir.mkdir(parents=True, exist_ok=True)
+    name = _version_name("marts")
+    tmp = parquet_dir / f".{name}.tmp"
+    tmp.mkdir()
+    with duckdb.connect(str(snapshot), read_only=True) as conn:
+        for table in PARQUET_MARTS:
+            conn.execute(
+                f"""
+                copy marts.{table} to '{tmp / table}' (
+                    format parquet,
+                    partition_by (occupation_field, workplace_region),
+                    compression zstd,
+                    row_group_size 100000
+                )
+                """
+            )
+    os.replace(tmp, parquet_dir / name)
+
+    _point_current(parquet_dir, name)
+    _prune(parquet_dir, "marts_*", keep)
+    return parquet_dir / name
+
+
+@dg.asset(deps=[dg.AssetKey(["DWH", "dim_job_description"])])
+def ad_clusters(context: dg.AssetExecutionContext):
+    hashed, ads, duplicates = update_ad_clusters(Path(DUCKDB_PATH))
+    context.log.info(f"Hashed {hashed} new or changed ads, {duplicates} of {ads} ads are near-duplicates")
+    return dg.MaterializeResult(metadata={"hashed": hashed, "ads": ads, "duplicates": duplicates})
+
+
+# built on the working copy before the snapshot, so every published snapshot ships its index
+@dg.asset(deps=dbt_models.keys)
+def search_index(context: dg.AssetExecutionContext):
+    indexed, documents = update_search_index(Path(DUCKDB_PATH))
+    context.log.info(f"Indexed {indexed} new or changed ads, {documents} ads searchable")
+    return dg.MaterializeResult(metadata={"indexed": indexed, "documents": documents})
+
+
+@dg.asset(deps=[*dbt_models.keys, search_index])
+def warehouse_snapshot(context: dg.AssetExecutionContext):
+    snapshot = publish_snapshot(Path(DUCKDB_PATH), SNAPSHOT_DIR, SNAPSHOT_KEEP)
+    context.log.info(f"Published {snapshot}")
+    return dg.MaterializeResult(
+        metadata={"snapshot": str(snapshot), "size_mb": round(snapshot.stat().st_size / 1024**2, 1)}
+    )
+
+
+# reads the published snapshot, never the working copy, so it cannot collide with the next load
+@dg.asset(deps=[warehouse_snapshot])
+def marts_parquet(context: dg.AssetExecutionContext):
+    export = export_marts_parquet(current_snapshot(), MARTS_PARQUET_DIR, SNAPSHOT_KEEP)
+    context.log.info(f"Exported marts to {export}")
+    files = list(export.rglob("*.parquet"))
+    return dg.MaterializeResult(
+        metadata={
+            "export": str(export),
+            "files": len(files),
+            "size_mb": round(sum(f.stat().st_size for f in files) / 1024**2, 1),
+        }
+    )
+
+
+def export_dashboard_arrow(snapshot, arrow_dir, keep):
+    """
+    Writes the dashboard dataset as an uncompressed Arrow IPC file (Feather v2), which the dashboard
+    memory-maps so every session and worker process shares the same pages instead of its own copy.
+    """
+    arrow_dir.mkdir(parents=True, exist_ok=True)
+    name = _version_name("job_listings", ".arrow")
+    tmp = arrow_dir / f".{name}.tmp"
+    with duckdb.connect(str(snapshot), read_only=True) as conn:
+        batches = conn.execute(job_listings_query()).fetch_record_batch(100_000)
+        with pa.ipc.new_file(str(tmp), batches.schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    os.replace(tmp, arrow_dir / name)
+
+    _point_current(arrow_dir, name)
+    _prune(arrow_dir, "job_listings_*.arrow", keep)
+    return arrow_dir / name
+
+
+@dg.asset(deps=[warehouse_snapshot])
+def dashboard_arrow(context: dg.AssetExecutionContext):
+    export = export_dashboard_arrow(current_snapshot(), DASHBOARD_ARROW_DIR, SNAPSHOT_KEEP)
+    context.log.info(f"Exported the dashboard dataset to {export}")
+    return dg.MaterializeResult(
+        metadata={"export": str(export), "size_mb": round(export.stat().st_size / 1024**2, 1)}
+    )
+
+
 #jobs
-job_dlt = dg.define_asset_job("job_dlt", selection=dg.AssetSelection.keys("dlt_jobsearch_source_jobsearch_resource"))
+job_dlt = dg.define_asset_job(
+    "job_dlt",
+    selection=dg.AssetSelection.keys("dlt_jobsearch_source_jobsearch_resource"),
+    op_retry_policy=dg.RetryPolicy(max_retries=3, delay=300),
+)
 
-job_dbt = dg.define_asset_job("job_dbt", selection=dg.AssetSelection.key_prefixes("DWH","marts"))
+job_dbt = dg.define_asset_job(
+    "job_dbt",
+    selection=dg.AssetSelection.key_prefixes("staging","DWH","marts","search") | dg.AssetSelection.assets(ad_clusters, search_index, warehouse_snapshot, marts_parquet, dashboard_arrow),
+)
 
 
 schedule_dlt = dg.ScheduleDefinition(job=job_dlt, cron_schedule="0 9 * * *") #UTC
@@ -64,7 +238,7 @@ def dlt_load_sensor():
 
 #definitions
 defs = dg.Definitions(
-    assets=[dlt_load, dbt_models],
+    assets=[dlt_load, dbt_models, ad_clusters, search_index, warehouse_snapshot, marts_parquet, dashboard_arrow],
     resources={"dlt": dlt_resource, "dbt": dbt_resource},
     jobs=[job_dlt, job_dbt],
     schedules=[schedule_dlt],
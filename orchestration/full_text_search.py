@@ -0,0 +1,94 @@
+"""Incremental BM25 term index over the job ad texts, read by the dashboard's search box."""
+import duckdb
+
+# lowercased runs of letters and digits, so å, ä, ö and é stay inside words
+SEARCH_TOKENIZER = r"list_filter(string_split_regex(lower(text), '[^\p{L}\p{N}]+'), token -> token <> '')"
+
+
+def update_search_index(database, rebuild=False):
+    """
+    Keeps the search schema's term index in sync with DWH.dim_job_description, stemmed with the fts
+    extension's Swedish Snowball stemmer and without search.swedish_stopwords (a dbt seed).
+    Only ads whose _dlt_load_id is newer than the newest indexed one are tokenized, their old
+    postings are replaced, so a daily load costs the new and changed ads, not the whole table.
+    """
+    with duckdb.connect(str(database)) as conn:
+        conn.execute("install fts")
+        conn.execute("load fts")
+        conn.execute("begin transaction")
+        if rebuild:
+            conn.execute("drop table if exists search.documents")
+            conn.execute("drop table if exists search.terms")
+        # the dashboard tokenizes search queries with the same macro, stored in the database file
+        conn.execute(f"create or replace macro search.tokenize(text) as {SEARCH_TOKENIZER}")
+        conn.execute(
+            """
+            create table if not exists search.documents (
+                job_description_id varchar,
+                _dlt_load_id varchar,
+                length integer
+            )
+            """
+        )
+        conn.execute(
+            """
+            create table if not exists search.terms (
+                term varchar,
+                job_description_id varchar,
+                tf integer
+            )
+            """
+        )
+
+        last_load_id = conn.execute("select coalesce(max(_dlt_load_id), '') from search.documents").fetchone()[0]
+        conn.execute(
+            """
+            create temp table changed as
+            select job_description_id, _dlt_load_id, coalesce(headline, '') || ' ' || coalesce(description_text, '') as text
+            from DWH.dim_job_description
+            where _dlt_load_id > ?
+            """,
+            [last_load_id],
+        )
+        # ads reloaded with a new text and ads no longer in the dimension lose their old postings
+        conn.execute(
+            """
+            delete from search.terms
+            where job_description_id in (select job_description_id from changed)
+               or job_description_id not in (select job_description_id from DWH.dim_job_description)
+            """
+        )
+        conn.execute(
+            """
+            delete from search.documents
+            where job_description_id in (select job_description_id from changed)
+               or job_description_id not in (select job_description_id from DWH.dim_job_description)
+            """
+        )
+        conn.execute(
+            """
+            insert into search.terms
+            with tokens as (
+                select job_description_id, unnest(search.tokenize(text)) as token
+                from changed
+            )
+            select stem(token, 'swedish') as term, job_description_id, count(*) as tf
+            from tokens
+            where token not in (select word from search.swedish_stopwords)
+            group by all
+            order by term
+            """
+        )
+        conn.execute(
+            """
+            insert into search.documents
+            select c.job_description_id, c._dlt_load_id, coalesce(sum(t.tf), 0) as length
+            from changed c
+            left join search.terms t on t.job_description_id = c.job_description_id
+            group by all
+            """
+        )
+        indexed = conn.execute("select count(*) from changed").fetchone()[0]
+        documents = conn.execute("select count(*) from search.documents").fetchone()[0]
+        conn.execute("commit")
+    return indexed, documents
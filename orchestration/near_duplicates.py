@@ -0,0 +1,190 @@
+"""Near-duplicate job ads: MinHash signatures of the description shingles, LSH candidates, clusters."""
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# 64 MinHash values split into 16 LSH bands of 4: ads sharing any band become candidates from
+# about 50% Jaccard similarity, candidates are only linked when 80% of the values agree
+MINHASH_BANDS = 16
+MINHASH_ROWS = 4
+MINHASH_PERMUTATIONS = MINHASH_BANDS * MINHASH_ROWS
+DUPLICATE_THRESHOLD = 0.8
+SHINGLE_WORDS = 5
+# shorter descriptions ("Se bifogad annons") say nothing about the ad, they are never clustered
+MIN_SHINGLES = 10
+# what src_job_description puts in place of a missing description
+MISSING_DESCRIPTION = "Beskrivning saknas"
+# the legacy RandomState stream never changes between numpy versions, the cached signatures stay valid
+_MINHASH_A, _MINHASH_B = np.random.RandomState(42).randint(1, 2**32, size=(2, MINHASH_PERMUTATIONS), dtype=np.uint64)
+_MERSENNE_PRIME = np.uint64(2**61 - 1)
+
+
+def minhash_signatures(shingles):
+    """One row of MINHASH_PERMUTATIONS uint32 minimums per ad, from a list array of 64-bit shingle hashes."""
+    offsets = shingles.offsets.to_numpy()
+    starts = offsets[:-1] - offsets[0]
+    values = pc.list_flatten(shingles).to_numpy() & np.uint64(0xFFFFFFFF)
+    signatures = np.empty((len(shingles), MINHASH_PERMUTATIONS), dtype=np.uint32)
+    for i in range(MINHASH_PERMUTATIONS):
+        # a * h + b stays below 2**64 because a, b and h are all 32-bit
+        hashed = (_MINHASH_A[i] * values + _MINHASH_B[i]) % _MERSENNE_PRIME
+        signatures[:, i] = np.minimum.reduceat(hashed & np.uint64(0xFFFFFFFF), starts)
+    return signatures
+
+
+def _lsh_edges(signatures):
+    """
+    Links every ad to the first ad (smallest row) of each LSH bucket it shares with others, a bucket
+    is one key of a band's MINHASH_ROWS values. Links are kept when at least DUPLICATE_THRESHOLD of
+    the two signatures agree, the estimated Jaccard similarity of the shingles, so a rare key
+    collision only costs a check.
+    """
+    count = len(signatures)
+    links = []
+    for band in range(MINHASH_BANDS):
+        # pairs of uint32 values read as one uint64 (MINHASH_ROWS is even), folded into one key
+        values = np.ascontiguousarray(signatures[:, band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]).view(np.uint64)
+        key = values[:, 0]
+        for column in values[:, 1:].T:
+            key = key * np.uint64(0x9E3779B97F4A7C15) ^ column
+        # a stable sort, so each bucket starts with its smallest row
+        order = np.argsort(key, kind="stable")
+        ordered = key[order]
+        starts = np.ones(count, dtype=bool)
+        starts[1:] = ordered[1:] != ordered[:-1]
+        first = order[np.maximum.accumulate(np.where(starts, np.arange(count), 0))]
+        # one int64 per pair, so the same pair from several bands is only checked once
+        links.append(order[~starts] * count + first[~starts])
+    # sorted and deduplicated by hand, np.unique is many times slower on arrays this size
+    links = np.sort(np.concatenate(links))
+    links = links[np.diff(links, prepend=-1) != 0]
+    source, target = links // count, links % count
+
+    agree = np.empty(len(links), dtype=np.int64)
+    for start in range(0, len(links), 1_000_000):
+        chunk = slice(start, start + 1_000_000)
+        agree[chunk] = (signatures[source[chunk]] == signatures[target[chunk]]).sum(axis=1)
+    similar = agree >= DUPLICATE_THRESHOLD * MINHASH_PERMUTATIONS
+    return source[similar], target[similar]
+
+
+def _connected_components(count, source, target):
+    """Component label (its smallest node) for nodes 0..count-1 linked by the edges source[i] - target[i]."""
+    labels = np.arange(count)
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, source, labels[target])
+        np.minimum.at(labels, target, labels[source])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def update_ad_clusters(database):
+    """
+    Groups near-duplicate ads (reposts under a new id, the same ad in several regions) into
+    dedup.ad_clusters: job_description_id, cluster_id (the smallest id in the cluster), cluster_size.
+    MinHash signatures of the description's word shingles are cached per ad in dedup.minhash_signatures
+    and only computed for ads loaded since the last run. Candidate pairs come from the LSH buckets,
+    each bucket links its members to one representative, so the work grows with the number of ads
+    instead of the number of pairs.
+    """
+    with duckdb.connect(str(database)) as conn:
+        conn.execute("begin transaction")
+        conn.execute("create schema if not exists dedup")
+        conn.execute(
+            f"""
+            create table if not exists dedup.minhash_signatures (
+                job_description_id varchar,
+                _dlt_load_id varchar,
+                shingles integer,
+                signature uinteger[{MINHASH_PERMUTATIONS}]
+            )
+            """
+        )
+        columns = conn.execute(
+            "select column_name from duckdb_columns() where schema_name = 'dedup' and table_name = 'minhash_signatures'"
+        ).fetchall()
+        if ("shingles",) not in columns:
+            # cached before descriptions were filtered, placeholders and short texts included: hash everything again
+            conn.execute("drop table dedup.minhash_signatures")
+            conn.execute(
+                f"""
+                create table dedup.minhash_signatures (
+                    job_description_id varchar,
+                    _dlt_load_id varchar,
+                    shingles integer,
+                    signature uinteger[{MINHASH_PERMUTATIONS}]
+                )
+                """
+            )
+
+        last_load_id = conn.execute("select coalesce(max(_dlt_load_id), '') from dedup.minhash_signatures").fetchone()[0]
+        conn.execute(
+            """
+            delete from dedup.minhash_signatures
+            where job_description_id in (select job_description_id from DWH.dim_job_description where _dlt_load_id > ?)
+               or job_description_id not in (select job_description_id from DWH.dim_job_description)
+               or shingles < ?
+            """,
+            [last_load_id, MIN_SHINGLES],
+        )
+
+        # streamed on its own cursor, the inserts on conn would cancel a pending result.
+        # ads without a description (the placeholder) or with fewer than MIN_SHINGLES shingles get
+        # no signature and no cluster row, the marts count them as unique
+        batches = conn.cursor().execute(
+            f"""
+            with
+                changed as (
+                    select job_description_id, _dlt_load_id, list_filter(
+                        string_split_regex(lower(description_text), '[^\\p{{L}}\\p{{N}}]+'), token -> token <> ''
+                    ) as words
+                    from DWH.dim_job_description
+                    where _dlt_load_id > ? and description_text <> ?
+                ),
+                shingled as (
+                    select job_description_id, _dlt_load_id, list_distinct(list_transform(
+                        range(1, len(words) - {SHINGLE_WORDS - 2}),
+                        i -> hash(array_to_string(words[i:i + {SHINGLE_WORDS - 1}], ' '))
+                    )) as shingles
+                    from changed
+                )
+            select * from shingled
+            where len(shingles) >= ?
+            """,
+            [last_load_id, MISSING_DESCRIPTION, MIN_SHINGLES],
+        ).fetch_record_batch(50_000)
+        hashed = 0
+        for batch in batches:
+            signatures = minhash_signatures(batch.column("shingles"))
+            rows = pa.table({
+                "job_description_id": batch.column("job_description_id"),
+                "_dlt_load_id": batch.column("_dlt_load_id"),
+                "shingles": pc.list_value_length(batch.column("shingles")).cast(pa.int32()),
+                "signature": pa.FixedSizeListArray.from_arrays(signatures.ravel(), MINHASH_PERMUTATIONS),
+            })
+            conn.register("signature_batch", rows)
+            conn.execute("insert into dedup.minhash_signatures select * from signature_batch")
+            conn.unregister("signature_batch")
+            hashed += len(batch)
+
+        cached = conn.execute(
+            "select job_description_id, signature from dedup.minhash_signatures order by job_description_id"
+        ).fetch_arrow_table()
+        ids = cached["job_description_id"]
+        matrix = pc.list_flatten(cached["signature"]).to_numpy().reshape(-1, MINHASH_PERMUTATIONS)
+        source, target = _lsh_edges(matrix)
+        labels = _connected_components(len(matrix), source, target)
+
+        clusters = pa.table({
+            "job_description_id": ids,
+            "cluster_id": ids.take(labels),
+            "cluster_size": np.bincount(labels, minlength=len(matrix))[labels],
+        })
+        conn.register("clusters", clusters)
+        conn.execute("create or replace table dedup.ad_clusters as select * from clusters order by cluster_id, job_description_id")
+        conn.unregister("clusters")
+        conn.execute("commit")
+    return hashed, len(matrix), int((labels != np.arange(len(matrix))).sum())
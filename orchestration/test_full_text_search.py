@@ -0,0 +1,86 @@
+"""Tests for the incremental search index on a throwaway warehouse:
+
+    cd orchestration && python -m pytest -q test_full_text_search.py
+"""
+import duckdb
+import pytest
+
+from full_text_search import update_search_index
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    database = tmp_path / "job_ads.duckdb"
+    with duckdb.connect(str(database)) as conn:
+        conn.execute("create schema DWH")
+        conn.execute("create schema search")
+        conn.execute("create table search.swedish_stopwords as select unnest(['och', 'till', 'en']) as word")
+        conn.execute(
+            """
+            create table DWH.dim_job_description (
+                job_description_id varchar, _dlt_load_id varchar, headline varchar, description_text varchar
+            )
+            """
+        )
+        conn.execute(
+            """
+            insert into DWH.dim_job_description values
+                ('1', '100', 'Sjuksköterskor sökes', 'Vi söker sjuksköterskor till akuten och en undersköterska'),
+                ('2', '100', 'Snickare', 'Snickare till byggprojekt i Malmö'),
+                ('3', '100', 'Lärare', null)
+            """
+        )
+    return database
+
+
+def postings(database):
+    with duckdb.connect(str(database)) as conn:
+        terms = conn.execute("select term, job_description_id, tf from search.terms order by all").fetchall()
+        documents = conn.execute("select job_description_id, _dlt_load_id, length from search.documents order by all").fetchall()
+    return terms, documents
+
+
+def test_terms_are_stemmed_without_stopwords(warehouse):
+    assert update_search_index(warehouse) == (3, 3)
+    terms, documents = postings(warehouse)
+
+    # the headline and the text count towards the same term
+    assert ("sjukskötersk", "1", 2) in terms
+    assert ("malmö", "2", 1) in terms
+    assert not [term for term in terms if term[0] in ("och", "till", "en")]
+    # a missing text still leaves the headline searchable
+    assert ("3", "100", 1) in documents
+    # the document length is its number of indexed tokens
+    lengths = {ad: length for ad, _, length in documents}
+    assert lengths["1"] == sum(tf for _, ad, tf in terms if ad == "1")
+
+
+def test_only_new_and_changed_ads_are_tokenized(warehouse):
+    update_search_index(warehouse)
+    with duckdb.connect(str(warehouse)) as conn:
+        conn.execute("update DWH.dim_job_description set _dlt_load_id = '200', description_text = 'Elektriker i Umeå' where job_description_id = '2'")
+        conn.execute("delete from DWH.dim_job_description where job_description_id = '3'")
+
+    assert update_search_index(warehouse) == (1, 2)
+    terms, documents = postings(warehouse)
+    assert ("umeå", "2", 1) in terms
+    assert not [term for term in terms if term[1] == "2" and term[0] == "malmö"]
+    assert not [term for term in terms if term[1] == "3"]
+    assert [d[0] for d in documents] == ["1", "2"]
+
+    # nothing changed since, nothing is tokenized
+    assert update_search_index(warehouse) == (0, 2)
+    assert postings(warehouse) == (terms, documents)
+
+
+def test_rebuild_indexes_everything_again(warehouse):
+    update_search_index(warehouse)
+    before = postings(warehouse)
+    assert update_search_index(warehouse, rebuild=True) == (3, 3)
+    assert postings(warehouse) == before
+
+
+def test_queries_tokenize_with_the_stored_macro(warehouse):
+    update_search_index(warehouse)
+    with duckdb.connect(str(warehouse), read_only=True) as conn:
+        assert conn.execute("select search.tokenize('Sjuksköterska, Göteborg!')").fetchone()[0] == ["sjuksköterska", "göteborg"]
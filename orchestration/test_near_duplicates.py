@@ -0,0 +1,116 @@
+"""Tests for the near-duplicate clustering, on plain arrays and on a throwaway warehouse:
+
+    cd orchestration && python -m pytest -q test_near_duplicates.py
+"""
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from near_duplicates import (
+    MINHASH_PERMUTATIONS,
+    MISSING_DESCRIPTION,
+    _connected_components,
+    _lsh_edges,
+    minhash_signatures,
+    update_ad_clusters,
+)
+
+nurse = "Vi söker en erfaren sjuksköterska till vår avdelning i Göteborg med god kunskap inom vård och omsorg samt intresse för utveckling"
+warehouse_worker = "Lagerarbetare till vårt lager i Malmö med truckkort och vana av skiftarbete dag kväll natt och helger ingår i tjänsten"
+
+
+def shingle_lists(*sets):
+    return pa.array([sorted(values) for values in sets], pa.list_(pa.uint64()))
+
+
+def test_identical_shingles_give_identical_signatures():
+    signatures = minhash_signatures(shingle_lists(range(100), range(99, -1, -1), range(100, 200)))
+    assert signatures.shape == (3, MINHASH_PERMUTATIONS)
+    assert (signatures[0] == signatures[1]).all()
+    assert (signatures[0] == signatures[2]).mean() < 0.2
+
+
+def test_agreement_estimates_jaccard_similarity():
+    # 500 shared of 1500 distinct shingles
+    signatures = minhash_signatures(shingle_lists(range(0, 1000), range(500, 1500)))
+    assert (signatures[0] == signatures[1]).mean() == pytest.approx(1 / 3, abs=0.2)
+
+
+def test_sliced_batches_hash_their_own_rows():
+    shingles = shingle_lists(range(10), range(100), range(50, 150))
+    assert (minhash_signatures(shingles.slice(1)) == minhash_signatures(shingles)[1:]).all()
+
+
+def test_only_similar_signatures_end_up_in_one_component():
+    rng = np.random.default_rng(0)
+    signatures = rng.integers(0, 2**32, size=(5, MINHASH_PERMUTATIONS), dtype=np.uint32)
+    signatures[1] = signatures[0]
+    signatures[3] = signatures[0]
+    signatures[3, :8] += 1   # 87% agree, a near-duplicate
+    signatures[4] = signatures[0]
+    signatures[4, 4:] += 1   # shares the first band, but only 6% agree
+    source, target = _lsh_edges(signatures)
+    assert _connected_components(len(signatures), source, target).tolist() == [0, 0, 2, 0, 4]
+
+
+def test_components_are_labelled_with_their_smallest_node():
+    labels = _connected_components(7, np.array([4, 3, 5]), np.array([3, 1, 6]))
+    assert labels.tolist() == [0, 1, 2, 1, 1, 5, 5]
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    database = tmp_path / "job_ads.duckdb"
+    with duckdb.connect(str(database)) as conn:
+        conn.execute("create schema DWH")
+        conn.execute("create table DWH.dim_job_description (job_description_id varchar, _dlt_load_id varchar, description_text varchar)")
+        ads = [(f"nurse{i}", "100", nurse) for i in range(3)] + [("warehouse", "100", warehouse_worker)]
+        # what dbt writes for ads without a description, and a description with too few words
+        ads += [(f"missing{i}", "100", MISSING_DESCRIPTION) for i in range(20)]
+        ads += [(f"short{i}", "100", "Se bifogad annons") for i in range(5)]
+        conn.executemany("insert into DWH.dim_job_description values (?, ?, ?)", ads)
+    return database
+
+
+def clusters(database):
+    with duckdb.connect(str(database), read_only=True) as conn:
+        return conn.execute("select job_description_id, cluster_id, cluster_size from dedup.ad_clusters order by all").fetchall()
+
+
+def test_only_real_descriptions_are_clustered(warehouse):
+    assert update_ad_clusters(warehouse) == (4, 4, 2)
+    assert clusters(warehouse) == [
+        ("nurse0", "nurse0", 3),
+        ("nurse1", "nurse0", 3),
+        ("nurse2", "nurse0", 3),
+        ("warehouse", "warehouse", 1),
+    ]
+
+
+def test_only_new_and_changed_ads_are_hashed(warehouse):
+    update_ad_clusters(warehouse)
+    assert update_ad_clusters(warehouse) == (0, 4, 2)
+
+    with duckdb.connect(str(warehouse)) as conn:
+        conn.execute("update DWH.dim_job_description set _dlt_load_id = '200', description_text = ? where job_description_id = 'nurse2'", [warehouse_worker])
+        conn.execute("delete from DWH.dim_job_description where job_description_id = 'nurse1'")
+    assert update_ad_clusters(warehouse) == (1, 3, 1)
+    assert clusters(warehouse) == [
+        ("nurse0", "nurse0", 1),
+        ("nurse2", "nurse2", 2),
+        ("warehouse", "nurse2", 2),
+    ]
+
+
+def test_a_cache_without_shingle_counts_is_rebuilt(warehouse):
+    with duckdb.connect(str(warehouse)) as conn:
+        conn.execute("create schema dedup")
+        conn.execute(
+            f"""
+            create table dedup.minhash_signatures as
+            select job_description_id, _dlt_load_id, list_transform(range({MINHASH_PERMUTATIONS}), i -> 0)::uinteger[{MINHASH_PERMUTATIONS}] as signature
+            from DWH.dim_job_description
+            """
+        )
+    assert update_ad_clusters(warehouse) == (4, 4, 2)